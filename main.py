@@ -2,43 +2,62 @@ from __future__ import annotations
 
 import asyncio
 import os
+import sys
 from pathlib import Path
 
 from telegram_lmstudio_brave_bot.config import load_settings
 
+# Import up front so startup cost is paid before the event loop exists; keep the error for a friendly message.
+_IMPORT_ERR: ModuleNotFoundError | None = None
+try:
+    from telegram_lmstudio_brave_bot.bot import run_bot
+except ModuleNotFoundError as e:
+    _IMPORT_ERR = e
+    run_bot = None
+
 
 def _load_env_fallback(env_path: Path) -> None:
     if not env_path.exists():
         return
 
+    env = os.environ
     for raw in env_path.read_text(encoding="utf-8").splitlines():
         line = raw.strip()
-        if not line or line.startswith("#"):
+        if not line or line[0] == "#":
             continue
-        if "=" not in line:
+        k, sep, v = line.partition("=")
+        if not sep:
             continue
-        k, v = line.split("=", 1)
         k = k.strip()
-        v = v.strip().strip('"').strip("'")
-        if k and k not in os.environ:
-            os.environ[k] = v
+        if k and k not in env:
+            env[k] = v.strip().strip('"').strip("'")
 
 
 def load_env() -> None:
     try:
         from dotenv import load_dotenv  # type: ignore
-
-        load_dotenv()
-    except Exception:
+    except ImportError:
         _load_env_fallback(Path(__file__).with_name(".env"))
+        return
+
+    load_dotenv()
+
+
+def _install_uvloop() -> None:
+    # uvloop is POSIX-only; Windows keeps the default asyncio loop.
+    if sys.platform == "win32":
+        return
+    try:
+        import uvloop  # type: ignore
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
 def main() -> None:
     load_env()
-    try:
-        from telegram_lmstudio_brave_bot.bot import run_bot
-    except ModuleNotFoundError as e:
-        missing = getattr(e, "name", None) or str(e)
+    if _IMPORT_ERR is not None:
+        missing = getattr(_IMPORT_ERR, "name", None) or str(_IMPORT_ERR)
         raise SystemExit(
             "Missing dependency: "
             + str(missing)
@@ -54,6 +73,7 @@ def main() -> None:
         )
 
     settings = load_settings()
+    _install_uvloop()
     asyncio.run(run_bot(settings))
 
 
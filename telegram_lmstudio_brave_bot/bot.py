@@ -1,73 +1,155 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import ipaddress
 import time
 import logging
 import os
 import re
+import signal
 from html.parser import HTMLParser
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterator
+from functools import lru_cache, partial
 from urllib.parse import urlparse
 
 import httpx
-from telegram import Update
+from telegram import Message, Update
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.request import HTTPXRequest
 
+from . import jsonutil
 from .brave_search import BraveSearchClient
 from .config import Settings
 from .lmstudio import LMStudioClient, llm_plan_tools
 from .memory import MarkdownMemory
 from .debug_logger import debug_logger_from_settings
 
+try:
+    from selectolax.lexbor import LexborHTMLParser  # type: ignore
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    from opencc import OpenCC  # type: ignore
+except ImportError:
+    OpenCC = None
+
 
 class _TextExtractor(HTMLParser):
     def __init__(self):
         super().__init__()
         self._out: list[str] = []
+        # Incremental feeds split one text node across several handle_data calls; join them before emitting.
+        self._pending: list[str] = []
         self._skip = 0
+        self.chars = 0
+
+    def _flush_text(self) -> None:
+        if not self._pending:
+            return
+        t = " ".join("".join(self._pending).split())
+        self._pending.clear()
+        if t:
+            self._out.append(t)
+            self.chars += len(t) + 1
 
     def handle_starttag(self, tag, attrs):
+        self._flush_text()
         if tag in {"script", "style", "noscript"}:
             self._skip += 1
 
     def handle_endtag(self, tag):
+        self._flush_text()
         if tag in {"script", "style", "noscript"} and self._skip > 0:
             self._skip -= 1
 
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+
     def handle_data(self, data):
         if self._skip:
             return
-        t = " ".join(data.split())
-        if t:
-            self._out.append(t)
+        self._pending.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_text()
 
     def text(self) -> str:
         return "\n".join(self._out)
 
 
+_MAX_HTML_BYTES = 1_000_000
+_FEED_BATCH_CHARS = 65536
+_TEXT_CONTENT_TYPES = ("html", "xml", "text/plain")
+
+
+def _html_to_text(html: str) -> str:
+    if LexborHTMLParser is None:
+        parser = _TextExtractor()
+        parser.feed(html)
+        parser.close()
+        return parser.text()
+
+    # Same output as _TextExtractor: one whitespace-collapsed line per text node, scripts/styles dropped.
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(["script", "style", "noscript"])
+    if tree.root is None:
+        return ""
+    out: list[str] = []
+    for node in tree.root.traverse(include_text=True):
+        if node.tag != "-text":
+            continue
+        t = " ".join((node.text_content or "").split())
+        if t:
+            out.append(t)
+    return "\n".join(out)
+
+
+# The same result URLs are parsed by several helpers and again on follow-up turns.
+_urlparse = lru_cache(maxsize=512)(urlparse)
+# Anything ipaddress.ip_address could accept: dotted digits (IPv4) or a colon (IPv6).
+_RE_IP_LITERAL_CANDIDATE = re.compile(r"[\d.]+|.*:.*")
+
+
+@lru_cache(maxsize=4096)
 def _is_public_http_url(url: str) -> bool:
     try:
-        u = urlparse(url)
-        if u.scheme not in {"http", "https"}:
-            return False
+        u = _urlparse(url)
         host = (u.hostname or "").strip().lower()
-        if not host:
-            return False
-        if host in {"localhost"}:
-            return False
-
-        try:
-            ip = ipaddress.ip_address(host)
-            if ip.is_private or ip.is_loopback or ip.is_link_local:
-                return False
-        except ValueError:
-            return True
+    except ValueError:
+        # Malformed netloc, e.g. an unclosed IPv6 bracket.
+        return False
+    if u.scheme not in {"http", "https"}:
+        return False
+    if not host:
+        return False
+    if host in {"localhost"}:
+        return False
+    # Ordinary hostnames skip the parse attempt and its ValueError.
+    if not _RE_IP_LITERAL_CANDIDATE.fullmatch(host):
+        return True
 
+    try:
+        ip = ipaddress.ip_address(host)
+        if ip.is_private or ip.is_loopback or ip.is_link_local:
+            return False
+    except ValueError:
         return True
-    except Exception:
-        return False
+
+    return True
 
 
 async def _fetch_page_text(
@@ -79,31 +161,74 @@ async def _fetch_page_text(
     if not _is_public_http_url(url):
         return ""
 
-    r = await client.get(
+    # Stream the body and stop reading once enough text (or raw HTML for selectolax) has arrived.
+    # Parsing runs in worker threads so concurrent fetches and polling are not blocked by it.
+    async with client.stream(
+        "GET",
         url,
         follow_redirects=True,
-        headers={"User-Agent": "telegram-bot/1.0"},
-    )
-    r.raise_for_status()
+    ) as r:
+        r.raise_for_status()
+        # PDFs, images and other binaries would only burn parser time; missing headers are given the benefit of the doubt.
+        ctype = r.headers.get("content-type", "").lower()
+        if ctype and not any(t in ctype for t in _TEXT_CONTENT_TYPES):
+            return ""
+        if LexborHTMLParser is None:
+            parser = _TextExtractor()
+            # Batch small decoded chunks so each worker-thread hop parses a meaningful amount of HTML.
+            pending: list[str] = []
+            pending_len = 0
+            async for chunk in r.aiter_text():
+                pending.append(chunk)
+                pending_len += len(chunk)
+                if pending_len < _FEED_BATCH_CHARS:
+                    continue
+                await asyncio.to_thread(parser.feed, "".join(pending))
+                pending.clear()
+                pending_len = 0
+                if parser.chars >= max_chars:
+                    break
+            else:
+                if pending:
+                    await asyncio.to_thread(parser.feed, "".join(pending))
+            parser.close()
+            text = parser.text()
+        else:
+            buf = bytearray()
+            async for chunk in r.aiter_bytes(chunk_size=65536):
+                buf += chunk
+                if len(buf) >= _MAX_HTML_BYTES:
+                    break
+            try:
+                html = buf.decode(r.charset_encoding or "utf-8", errors="replace")
+            except LookupError:
+                html = buf.decode("utf-8", errors="replace")
+            text = await asyncio.to_thread(_html_to_text, html)
 
-    html = r.text
-    parser = _TextExtractor()
-    parser.feed(html)
-    text = parser.text()
     if len(text) > max_chars:
         return text[:max_chars]
     return text
 
 
+# Anything str.lower() could change: ASCII capitals, or chars outside ASCII / CJK / fullwidth non-capitals.
+_RE_MAY_NEED_LOWER = re.compile(r"[A-Z]|[^\x00-\x7f\u2e80-\u9fff\uff00-\uff20\uff3b-\uffef]")
+
+
+def _maybe_lower(text: str) -> str:
+    # Chinese-only messages skip the copy that lower() would make.
+    return text.lower() if _RE_MAY_NEED_LOWER.search(text) else text
+
+
+def _keyword_re(keywords, flags: int = 0) -> re.Pattern[str]:
+    # Longest first so overlapping keywords prefer the more specific match.
+    return re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)), flags)
+
+
 def _normalize_location(loc: str) -> str:
-    t = loc.strip()
-    for suffix in ("市", "縣"):
-        if t.endswith(suffix):
-            return t[: -len(suffix)]
-    return t
+    return loc.strip().rstrip("市縣")
 
 
-_TW_LOCATIONS = {
+_TW_LOCATIONS = frozenset({
     "台北",
     "臺北",
     "新北",
@@ -128,66 +253,72 @@ _TW_LOCATIONS = {
     "澎湖",
     "金門",
     "馬祖",
-}
+})
+_TW_LOCATIONS_NORMALIZED = frozenset(_normalize_location(x) for x in _TW_LOCATIONS)
+
+
+_TW_LOCATION_RE = _keyword_re(_TW_LOCATIONS)
 
 
 def _is_tw_location(loc: str) -> bool:
-    return _normalize_location(loc).strip() in {_normalize_location(x) for x in _TW_LOCATIONS}
+    return _normalize_location(loc).strip() in _TW_LOCATIONS_NORMALIZED
 
 
+@lru_cache(maxsize=4096)
 def _domain(url: str) -> str:
     try:
-        return (urlparse(url).hostname or "").strip().lower()
-    except Exception:
+        return (_urlparse(url).hostname or "").strip().lower()
+    except ValueError:
         return ""
 
 
-def _wants_links(user_text: str) -> bool:
-    t = user_text.lower()
-    keywords = [
-        "連結",
-        "链接",
-        "網址",
-        "网址",
-        "url",
-        "link",
-        "來源",
-        "来源",
-        "source",
-    ]
-    return any(k in t for k in keywords)
-
-
-def _is_followup_continue(user_text: str) -> bool:
-    t = (user_text or "").strip().lower()
+_LINK_KEYWORDS = (
+    "連結",
+    "链接",
+    "網址",
+    "网址",
+    "url",
+    "link",
+    "來源",
+    "来源",
+    "source",
+)
+
+
+_RE_FOLLOWUP_COUNT = re.compile(r"(再|再多|更多|繼續|继续).{0,6}(\d{1,2})")
+_RE_ONE_OR_TWO_DIGITS = re.compile(r"(\d{1,2})")
+_FOLLOWUP_EXACT = frozenset({
+    "繼續",
+    "继续",
+    "更多",
+    "再來",
+    "再給",
+    "再多",
+    "再多列",
+    "再多幾條",
+    "再多幾則",
+    "再多一點",
+    "再多一些",
+    "more",
+    "continue",
+})
+
+
+def _is_followup_continue(user_text: str, text_lc: str | None = None) -> bool:
+    t = text_lc if text_lc is not None else _maybe_lower((user_text or "").strip())
     if not t:
         return False
-    exact = {
-        "繼續",
-        "继续",
-        "更多",
-        "再來",
-        "再給",
-        "再多",
-        "再多列",
-        "再多幾條",
-        "再多幾則",
-        "再多一點",
-        "再多一些",
-        "more",
-        "continue",
-    }
-    if t in exact:
+    if t in _FOLLOWUP_EXACT:
         return True
     # e.g. "再多列 5 條" / "再列3則" / "更多 10"
-    if re.search(r"(再|再多|更多|繼續|继续).{0,6}(\d{1,2})", t):
+    if _RE_FOLLOWUP_COUNT.search(t):
         return True
     return False
 
 
 def _extract_followup_count(user_text: str, default: int = 5, *, max_n: int = 10) -> int:
     t = (user_text or "")
-    m = re.search(r"(\d{1,2})", t)
+    m = _RE_ONE_OR_TWO_DIGITS.search(t)
     if not m:
         return max(1, min(default, max_n))
     try:
@@ -197,6 +328,9 @@ def _extract_followup_count(user_text: str, default: int = 5, *, max_n: int = 10
     return max(1, min(n, max_n))
 
 
+_RE_LEADING_MENTION = re.compile(r"^@([A-Za-z0-9_]+)\b\s*([:：,，\-—]*)\s*(.*)$")
+
+
 def _strip_leading_bot_mention(user_text: str, bot_username: str) -> tuple[str, bool]:
     t = (user_text or "").strip()
     u = (bot_username or "").strip().lstrip("@").lower()
@@ -204,7 +338,7 @@ def _strip_leading_bot_mention(user_text: str, bot_username: str) -> tuple[str,
         return t, False
 
     # Accept: "@MyBot ..." or "@MyBot: ..." or "@MyBot，..."
-    m = re.match(r"^@([A-Za-z0-9_]+)\b\s*([:：,，\-—]*)\s*(.*)$", t)
+    m = _RE_LEADING_MENTION.match(t)
     if not m:
         return t, False
     mentioned = (m.group(1) or "").lower() == u
@@ -231,52 +365,66 @@ def _profile_state_update(profile: dict[str, object], updates: dict[str, object]
     return state
 
 
-def _is_time_question(user_text: str) -> bool:
-    t = (user_text or "").strip().lower()
+_YEAR_MARKERS = ("今年", "哪一年", "幾年", "year")
+_DOW_MARKERS = ("星期幾", "禮拜幾", "礼拜几", "day of week")
+_DATE_MARKERS = ("哪一天", "幾號", "几号", "幾月", "日期", "date")
+_TIME_QUESTION_NEWS_MARKERS = (
+    "新聞",
+    "新闻",
+    "焦點",
+    "焦点",
+    "頭條",
+    "头条",
+    "國際",
+    "国际",
+    "體育",
+    "体育",
+    "賽事",
+    "赛事",
+    "要聞",
+    "要闻",
+)
+
+
+_RE_TODAY_DATE_QUESTION = re.compile(r"(今天|今日).*(哪一天|幾號|几号|幾月|日期|星期|禮拜|礼拜|date)")
+_TIME_QUESTION_NEWS_RE = _keyword_re(_TIME_QUESTION_NEWS_MARKERS)
+_YEAR_MARKERS_RE = _keyword_re(_YEAR_MARKERS)
+_DOW_MARKERS_RE = _keyword_re(_DOW_MARKERS)
+_DATE_MARKERS_RE = _keyword_re(_DATE_MARKERS)
+
+
+def _is_time_question(user_text: str, text_lc: str | None = None) -> bool:
+    t = text_lc if text_lc is not None else _maybe_lower((user_text or "").strip())
 
     # Avoid false positives like "今天新聞" / "今天國際新聞".
-    news_markers = [
-        "新聞",
-        "新闻",
-        "焦點",
-        "焦点",
-        "頭條",
-        "头条",
-        "國際",
-        "国际",
-        "體育",
-        "体育",
-        "賽事",
-        "赛事",
-        "要聞",
-        "要闻",
-    ]
-    if any(k in t for k in news_markers):
+    if _TIME_QUESTION_NEWS_RE.search(t):
         return False
 
     # Year questions.
-    if any(k in t for k in ["今年", "哪一年", "幾年", "year"]):
+    if _YEAR_MARKERS_RE.search(t):
         return True
 
     # Explicit day-of-week questions.
-    if any(k in t for k in ["星期幾", "禮拜幾", "礼拜几", "day of week"]):
+    if _DOW_MARKERS_RE.search(t):
         return True
 
     # Explicit date questions (require more than just "今天").
-    if re.search(r"(今天|今日).*(哪一天|幾號|几号|幾月|日期|星期|禮拜|礼拜|date)", t):
+    if _RE_TODAY_DATE_QUESTION.search(t):
         return True
-    if any(k in t for k in ["哪一天", "幾號", "几号", "幾月", "日期", "date"]):
+    if _DATE_MARKERS_RE.search(t):
         return True
 
     return False
 
 
-def _answer_time_question(user_text: str) -> str:
-    t = (user_text or "").strip().lower()
+_DOW_NAMES = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
+
+
+def _answer_time_question(user_text: str, text_lc: str | None = None) -> str:
+    t = text_lc if text_lc is not None else _maybe_lower((user_text or "").strip())
     now = time.localtime()
     y, mo, d = now.tm_year, now.tm_mon, now.tm_mday
-    dow_map = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
-    dow = dow_map[now.tm_wday % 7]
+    dow = _DOW_NAMES[now.tm_wday % 7]
 
     if "今年" in t or "哪一年" in t or "幾年" in t or "year" in t:
         return f"今年是 {y} 年。"
@@ -287,6 +435,29 @@ def _answer_time_question(user_text: str) -> str:
     return f"今天是 {y} 年 {mo} 月 {d} 日，{dow}。"
 
 
+_BAD_NEWS_PATH_MARKERS = (
+    "/search",
+    "/tag",
+    "/tagging",
+    "/topics",
+    "/section/",
+    "/sections/",
+    "/category/",
+    "/categories/",
+    "/topic/",
+)
+
+_BAD_NEWS_HOSTS = frozenset(
+    {
+        "apps.apple.com",
+        "play.google.com",
+        "sj.qq.com",
+        "m.baidu.com",
+    }
+)
+
+
+@lru_cache(maxsize=4096)
 def _is_low_quality_news_url(url: str) -> bool:
     u = (url or "").strip().lower()
     if not u.startswith("http"):
@@ -294,31 +465,14 @@ def _is_low_quality_news_url(url: str) -> bool:
     host = _domain(u)
     path = ""
     try:
-        path = urlparse(u).path or ""
+        path = _urlparse(u).path or ""
     except Exception:
         path = ""
 
-    bad_hosts = {
-        "apps.apple.com",
-        "play.google.com",
-        "sj.qq.com",
-        "m.baidu.com",
-    }
-    if host in bad_hosts:
+    if host in _BAD_NEWS_HOSTS:
         return True
 
-    bad_path_markers = [
-        "/search",
-        "/tag",
-        "/tagging",
-        "/topics",
-        "/section/",
-        "/sections/",
-        "/category/",
-        "/categories/",
-        "/topic/",
-    ]
-    if any(p in (path or "").lower() for p in bad_path_markers):
+    if any(p in (path or "").lower() for p in _BAD_NEWS_PATH_MARKERS):
         return True
 
     if host.endswith("wikipedia.org"):
@@ -330,6 +484,9 @@ def _is_low_quality_news_url(url: str) -> bool:
     return False
 
 
+_RE_WHITESPACE_RUN = re.compile(r"\s+")
+
+
 async def _summarize_conversation_for_profile(
     lm: LMStudioClient,
     *,
@@ -344,7 +501,7 @@ async def _summarize_conversation_for_profile(
         txt = str(m.get("content") or "").strip()
         if not role or not txt:
             continue
-        txt = re.sub(r"\s+", " ", txt)
+        txt = _RE_WHITESPACE_RUN.sub(" ", txt)
         content_lines.append(f"{role}: {txt}")
     convo = "\n".join(content_lines)
 
@@ -371,33 +528,70 @@ async def _summarize_conversation_for_profile(
     return (out or "").strip()
 
 
-def _infer_profile_updates(user_text: str) -> dict[str, object]:
+def _conversation_digest(existing_summary: str, turns: list[dict]) -> str:
+    h = hashlib.sha256(existing_summary.encode("utf-8"))
+    for m in turns:
+        h.update(b"\n")
+        h.update(jsonutil.dumps([m.get("role"), m.get("content")]))
+    return h.hexdigest()[:16]
+
+
+_RE_PREFER_ZH_HANT = re.compile(r"(以後|之後|請|麻煩).*(繁體|繁中)")
+_RE_PREFER_ZH_HANS = re.compile(r"(以後|之後|請|麻煩).*(簡體|简体|簡中|简中)")
+_RE_PREFER_EN = re.compile(r"(以後|之後|請|麻煩).*(英文|english)")
+_RE_PREFER_LINKS = re.compile(r"(以後|之後|都).*(附|給).*(連結|链接|網址|网址|來源|来源|link|url)")
+_RE_PREFER_NO_LINKS = re.compile(r"(以後|之後|都).*(不要|別|不必).*(連結|链接|網址|网址|來源|来源|link|url)")
+
+
+def _infer_profile_updates(user_text: str, text_lc: str | None = None) -> dict[str, object]:
     t = user_text.strip()
-    tl = t.lower()
+    tl = text_lc if text_lc is not None else t.lower()
     updates: dict[str, object] = {}
 
-    if re.search(r"(以後|之後|請|麻煩).*(繁體|繁中)", t):
+    if _RE_PREFER_ZH_HANT.search(t):
         updates["preferred_language"] = "zh-Hant"
-    elif re.search(r"(以後|之後|請|麻煩).*(簡體|简体|簡中|简中)", t):
+    elif _RE_PREFER_ZH_HANS.search(t):
         updates["preferred_language"] = "zh-Hans"
-    elif re.search(r"(以後|之後|請|麻煩).*(英文|english)", tl):
+    elif _RE_PREFER_EN.search(tl):
         updates["preferred_language"] = "en"
 
-    if re.search(r"(以後|之後|都).*(附|給).*(連結|链接|網址|网址|來源|来源|link|url)", tl):
+    if _RE_PREFER_LINKS.search(tl):
         updates["prefer_links"] = True
-    elif re.search(r"(以後|之後|都).*(不要|別|不必).*(連結|链接|網址|网址|來源|来源|link|url)", tl):
+    elif _RE_PREFER_NO_LINKS.search(tl):
         updates["prefer_links"] = False
 
     return updates
 
 
+def _profile_key(profile: dict[str, object]) -> tuple:
+    # Only the fields the renderers read, normalized and hashable, so renderings can be cached.
+    state = profile.get("state")
+    if not isinstance(state, dict):
+        state = {}
+    prefer_links = profile.get("prefer_links")
+    entities = state.get("entities")
+    return (
+        str(profile.get("preferred_language") or "").strip(),
+        str(profile.get("default_weather_location") or "").strip(),
+        prefer_links if isinstance(prefer_links, bool) else None,
+        str(profile.get("conversation_summary") or "").strip(),
+        str(state.get("topic") or "").strip(),
+        tuple(str(e).strip() for e in entities) if isinstance(entities, list) else (),
+        str(state.get("time_range") or "").strip(),
+    )
+
+
 def _profile_to_system_prompt(profile: dict[str, object]) -> str:
     if not profile:
         return ""
+    return _render_profile_prompt(_profile_key(profile))
+
 
+@lru_cache(maxsize=128)
+def _render_profile_prompt(key: tuple) -> str:
+    lang, default_loc, prefer_links, convo_summary, topic, entities, time_range = key
     lines: list[str] = []
 
-    lang = str(profile.get("preferred_language") or "").strip()
     if lang == "zh-Hant":
         lines.append("User preference: MUST reply in Traditional Chinese unless user explicitly asks otherwise.")
     elif lang == "zh-Hans":
@@ -405,35 +599,26 @@ def _profile_to_system_prompt(profile: dict[str, object]) -> str:
     elif lang == "en":
         lines.append("User preference: MUST reply in English unless user explicitly asks otherwise.")
 
-    default_loc = str(profile.get("default_weather_location") or "").strip()
     if default_loc:
         lines.append(f"User default weather location: {default_loc}.")
 
-    prefer_links = profile.get("prefer_links")
-    if isinstance(prefer_links, bool):
+    if prefer_links is not None:
         if prefer_links:
             lines.append("User preference: include source links when possible.")
         else:
             lines.append("User preference: avoid source links unless explicitly requested.")
 
-    convo_summary = str(profile.get("conversation_summary") or "").strip()
     if convo_summary:
         lines.append("Conversation summary (for context, do not repeat verbatim unless asked):")
         lines.append(convo_summary)
 
-    state = profile.get("state")
-    if isinstance(state, dict):
-        topic = str(state.get("topic") or "").strip()
-        entities = state.get("entities")
-        time_range = str(state.get("time_range") or "").strip()
-        if topic:
-            lines.append(f"Current topic: {topic}.")
-        if isinstance(entities, list) and entities:
-            safe_entities = [str(e).strip() for e in entities if str(e).strip()]
-            if safe_entities:
-                lines.append("Current entities: " + ", ".join(safe_entities) + ".")
-        if time_range:
-            lines.append(f"Current time range: {time_range}.")
+    if topic:
+        lines.append(f"Current topic: {topic}.")
+    safe_entities = [e for e in entities if e]
+    if safe_entities:
+        lines.append("Current entities: " + ", ".join(safe_entities) + ".")
+    if time_range:
+        lines.append(f"Current time range: {time_range}.")
 
     if not lines:
         return ""
@@ -461,10 +646,14 @@ def _merge_adjacent_same_role(messages: list[dict]) -> list[dict]:
 def _format_profile_text(profile: dict[str, object]) -> str:
     if not profile:
         return "目前沒有已儲存的長期記憶偏好。"
+    return _render_profile_text(_profile_key(profile))
 
+
+@lru_cache(maxsize=128)
+def _render_profile_text(key: tuple) -> str:
+    lang, default_loc, prefer_links = key[:3]
     lines: list[str] = []
 
-    lang = str(profile.get("preferred_language") or "").strip()
     if lang == "zh-Hant":
         lines.append("- 語言偏好：繁體中文")
     elif lang == "zh-Hans":
@@ -472,12 +661,10 @@ def _format_profile_text(profile: dict[str, object]) -> str:
     elif lang == "en":
         lines.append("- 語言偏好：英文")
 
-    default_loc = str(profile.get("default_weather_location") or "").strip()
     if default_loc:
         lines.append(f"- 預設天氣地區：{default_loc}")
 
-    prefer_links = profile.get("prefer_links")
-    if isinstance(prefer_links, bool):
+    if prefer_links is not None:
         lines.append(f"- 連結偏好：{'會附上來源連結' if prefer_links else '不主動附上來源連結'}")
 
     if not lines:
@@ -485,7 +672,7 @@ def _format_profile_text(profile: dict[str, object]) -> str:
     return "目前的長期記憶偏好：\n" + "\n".join(lines)
 
 
-_SIMPLIFIED_ONLY_MARKERS = {
+_SIMPLIFIED_ONLY_MARKERS = frozenset({
     "这",
     "个",
     "为",
@@ -504,80 +691,97 @@ _SIMPLIFIED_ONLY_MARKERS = {
     "报",
     "无",
     "并",
-}
+})
+
+
+@lru_cache(maxsize=1)
+def _s2t_converter():
+    return OpenCC("s2t") if OpenCC is not None else None
+
+
+def _convert_s2t(text: str) -> str | None:
+    cc = _s2t_converter()
+    if cc is None:
+        return None
+    try:
+        return cc.convert(text)
+    except Exception:
+        return None
+
+
+_RE_SIMPLIFIED_MARKER = re.compile("[" + "".join(sorted(_SIMPLIFIED_ONLY_MARKERS)) + "]")
 
 
 def _looks_simplified_chinese(text: str) -> bool:
     if not text:
         return False
-    hit = sum(text.count(ch) for ch in _SIMPLIFIED_ONLY_MARKERS)
-    return hit >= 2
-
-
-def _is_recent_news_query(user_text: str) -> bool:
-    t = user_text.lower()
-    recent_markers = [
-        "最近",
-        "近日",
-        "最新",
-        "近幾日",
-        "近几日",
-        "這幾天",
-        "这几天",
-        "24小時",
-        "24小时",
-        "今天",
-        "今日",
-    ]
-    news_markers = [
-        "新聞",
-        "新闻",
-        "news",
-        "軍演",
-        "军演",
-        "海域",
-        "時事",
-        "时事",
-        "快訊",
-        "快讯",
-        "財經",
-        "财经",
-        "金融",
-        "股市",
-        "指數",
-        "指数",
-        "道瓊",
-        "道琼",
-        "dow jones",
-        "nasdaq",
-        "s&p",
-        "sp500",
-    ]
-    return any(k in t for k in recent_markers) and any(k in t for k in news_markers)
-
-
-def _is_market_index_query(user_text: str) -> bool:
-    t = user_text.lower()
-    keywords = [
-        "道瓊",
-        "道琼",
-        "dow jones",
-        "djia",
-        "納斯達克",
-        "纳斯达克",
-        "nasdaq",
-        "s&p",
-        "sp500",
-        "指數",
-        "指数",
-        "股市",
-        "美股",
-    ]
-    return any(k in t for k in keywords)
+    # One scan that stops at the second marker, instead of one full str.count pass per marker.
+    hits = _RE_SIMPLIFIED_MARKER.finditer(text)
+    return next(hits, None) is not None and next(hits, None) is not None
+
+
+_RECENT_MARKERS = (
+    "最近",
+    "近日",
+    "最新",
+    "近幾日",
+    "近几日",
+    "這幾天",
+    "这几天",
+    "24小時",
+    "24小时",
+    "今天",
+    "今日",
+)
+
+_RECENT_NEWS_TOPIC_MARKERS = (
+    "新聞",
+    "新闻",
+    "news",
+    "軍演",
+    "军演",
+    "海域",
+    "時事",
+    "时事",
+    "快訊",
+    "快讯",
+    "財經",
+    "财经",
+    "金融",
+    "股市",
+    "指數",
+    "指数",
+    "道瓊",
+    "道琼",
+    "dow jones",
+    "nasdaq",
+    "s&p",
+    "sp500",
+)
+
+
+_MARKET_INDEX_KEYWORDS = (
+    "道瓊",
+    "道琼",
+    "dow jones",
+    "djia",
+    "納斯達克",
+    "纳斯达克",
+    "nasdaq",
+    "s&p",
+    "sp500",
+    "指數",
+    "指数",
+    "股市",
+    "美股",
+)
+
+
+_RE_YEAR = re.compile(r"(20\d{2})年?")
 
 
 def _extract_years(text: str) -> list[int]:
-    years = {int(y) for y in re.findall(r"(20\d{2})年?", text or "")}
+    years = {int(y) for y in _RE_YEAR.findall(text or "")}
     return sorted(years)
 
 
@@ -586,17 +790,23 @@ def _contains_stale_year_for_recent(text: str) -> bool:
     return any(y <= (current_year - 1) for y in _extract_years(text))
 
 
+_SOURCE_LINKS_MARKERS = ("來源連結", "来源链接", "來源鏈接", "source links", "references")
+_SOURCE_LINKS_RE = _keyword_re(_SOURCE_LINKS_MARKERS, re.IGNORECASE)
+_RE_SOURCE_LINKS_BLOCK = re.compile(_SOURCE_LINKS_RE.pattern + r"|\n\[[0-9]+\]\s+https?://", re.IGNORECASE)
+_RE_CITATION = re.compile(r"\[(\d{1,3})\]")
+_RE_PLACEHOLDER_CITATION = re.compile(r"\[(?:n|N)(?:=[^\]]+)?\]")
+_RE_FENCE_OPEN = re.compile(r"^```[a-zA-Z0-9_-]*\s*\n")
+_RE_FENCE_CLOSE = re.compile(r"\n```\s*$")
+
+
 def _has_source_links_block(text: str) -> bool:
-    t = (text or "").lower()
-    if any(k in t for k in ["來源連結", "来源链接", "來源鏈接", "source links", "references"]):
-        return True
-    return bool(re.search(r"\n\[[0-9]+\]\s+https?://", text or "", flags=re.IGNORECASE))
+    return _RE_SOURCE_LINKS_BLOCK.search(text or "") is not None
 
 
 def _extract_citation_indices(text: str, max_index: int) -> list[int]:
     seen: set[int] = set()
     out: list[int] = []
-    for m in re.finditer(r"\[(\d{1,3})\]", text or ""):
+    for m in _RE_CITATION.finditer(text or ""):
         i = int(m.group(1))
         if i < 1 or i > max_index:
             continue
@@ -610,7 +820,7 @@ def _extract_citation_indices(text: str, max_index: int) -> list[int]:
 def _sanitize_non_numeric_citations(text: str) -> str:
     # Models sometimes output placeholders like [n] / [n=1].
     # Keep numeric citations like [1] intact.
-    return re.sub(r"\[(?:n|N)(?:=[^\]]+)?\]", "", text or "")
+    return _RE_PLACEHOLDER_CITATION.sub("", text or "")
 
 
 def _extract_first_json_object(text: str) -> str | None:
@@ -620,8 +830,8 @@ def _extract_first_json_object(text: str) -> str | None:
 
     # Strip common fenced code blocks: ```json ... ```
     if s.startswith("```"):
-        s = re.sub(r"^```[a-zA-Z0-9_-]*\s*\n", "", s)
-        s = re.sub(r"\n```\s*$", "", s).strip()
+        s = _RE_FENCE_OPEN.sub("", s)
+        s = _RE_FENCE_CLOSE.sub("", s).strip()
 
     start = s.find("{")
     if start < 0:
@@ -695,17 +905,21 @@ def _spec_index_schema() -> dict:
     }
 
 
-def _news_has_diverse_citations(text: str, max_index: int) -> bool:
-    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip().startswith(("-", "•", "*"))]
+_RE_BULLET_LINE = re.compile(r"^[^\S\n]*([-•*][^\n]*)", re.MULTILINE)
+
+
+def _bullet_lines(text: str) -> list[str]:
+    # Bullet lines ("-", "•", "*"), stripped, found in one scan instead of splitlines + strip + filter.
+    return [m.group(1).rstrip() for m in _RE_BULLET_LINE.finditer(text or "")]
+
+
+def _news_has_diverse_citations(text: str, max_index: int, lines: list[str] | None = None) -> bool:
+    if lines is None:
+        lines = _bullet_lines(text)
     if len(lines) < 3:
         return True
 
-    cited: set[int] = set()
-    for ln in lines:
-        for m in re.finditer(r"\[(\d{1,3})\]", ln):
-            i = int(m.group(1))
-            if 1 <= i <= max_index:
-                cited.add(i)
+    cited = {i for i in map(int, _RE_CITATION.findall("\n".join(lines))) if 1 <= i <= max_index}
     # 至少要有兩個不同來源，避免全部集中在 [1]
     return len(cited) >= 2
 
@@ -718,6 +932,10 @@ def _ensure_bullets(text: str) -> list[str]:
     return ["- " + ln.strip() for ln in raw_lines[:5] if ln.strip()]
 
 
+_RE_ISO_DATE = re.compile(r"\b20\d{2}[-/]\d{1,2}[-/]\d{1,2}\b")
+_RE_BULLET_PREFIX = re.compile(r"^[-•*]\s*")
+
+
 async def _deterministic_news_fallback(
     lm: LMStudioClient,
     *,
@@ -769,11 +987,11 @@ async def _deterministic_news_fallback(
         line = lines[0].strip()
 
         hint = source_date_hints.get(i) or "[未提供日期]"
-        if hint != "[未提供日期]" and not re.search(r"\b20\d{2}[-/]\d{1,2}[-/]\d{1,2}\b", line):
+        if hint != "[未提供日期]" and not _RE_ISO_DATE.search(line):
             if "未提供日期" in line[:40]:
-                line = re.sub(r"\[未提供日期\]", hint, line, count=1)
+                line = line.replace("[未提供日期]", hint, 1)
             else:
-                line = "- **" + hint + "** " + re.sub(r"^[-•*]\s*", "", line)
+                line = "- **" + hint + "** " + _RE_BULLET_PREFIX.sub("", line)
 
         if f"[{i}]" not in line:
             line = line.rstrip() + f" [{i}]"
@@ -790,8 +1008,7 @@ def _strip_source_links_block(text: str) -> str:
     lines = (text or "").splitlines()
     cut = len(lines)
     for i, ln in enumerate(lines):
-        l = ln.strip().lower()
-        if any(k in l for k in ["來源連結", "来源链接", "來源鏈接", "source links", "references"]):
+        if _SOURCE_LINKS_RE.search(ln):
             cut = i
             break
     return "\n".join(lines[:cut]).rstrip()
@@ -818,15 +1035,18 @@ def _build_recent_news_fallback(*, user_text: str, search_results: list[dict[str
     return "\n".join(lines).strip()
 
 
-def _news_output_has_date_prefix(text: str) -> bool:
-    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip().startswith(("-", "•", "*"))]
+_RE_DATE_PREFIX = re.compile(r"20\d{2}\s*[-/年]\s*\d{1,2}(?:\s*[-/月]\s*\d{1,2}\s*日?)?")
+
+
+def _news_output_has_date_prefix(text: str, lines: list[str] | None = None) -> bool:
+    if lines is None:
+        lines = _bullet_lines(text)
     if not lines:
         return False
 
-    date_re = re.compile(r"20\d{2}\s*[-/年]\s*\d{1,2}(?:\s*[-/月]\s*\d{1,2}\s*日?)?")
     for ln in lines:
         head = ln[:64]
-        if date_re.search(head):
+        if _RE_DATE_PREFIX.search(head):
             continue
         if "未提供日期" in head:
             continue
@@ -844,55 +1064,45 @@ def _normalize_date_parts(year: int, month: int, day: int) -> str | None:
     return f"{year:04d}-{month:02d}-{day:02d}"
 
 
-def _extract_date_candidates(text: str) -> list[str]:
-    s = text or ""
-    out: list[str] = []
+# 2026-02-18 / 2026/02/18 / 2026年2月18日, or (as a lookahead, so it never hides a numeric date) February 17, 2026.
+_RE_DATES = re.compile(
+    r"(20\d{2})\s*[-/年]\s*(\d{1,2})\s*(?:[-/月]\s*(\d{1,2})\s*日?)?"
+    r"|(?=\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s*(20\d{2})\b)",
+    re.IGNORECASE,
+)
+_MONTHS_EN = {
+    "january": 1,
+    "february": 2,
+    "march": 3,
+    "april": 4,
+    "may": 5,
+    "june": 6,
+    "july": 7,
+    "august": 8,
+    "september": 9,
+    "october": 10,
+    "november": 11,
+    "december": 12,
+}
 
-    # 2026-02-18 / 2026/02/18 / 2026年2月18日
-    for m in re.finditer(r"(20\d{2})\s*[-/年]\s*(\d{1,2})\s*(?:[-/月]\s*(\d{1,2})\s*日?)?", s):
-        y = int(m.group(1))
-        mo = int(m.group(2))
-        d = int(m.group(3) or 1)
-        norm = _normalize_date_parts(y, mo, d)
-        if norm:
-            out.append(norm)
-
-    # February 17, 2026
-    month_map = {
-        "january": 1,
-        "february": 2,
-        "march": 3,
-        "april": 4,
-        "may": 5,
-        "june": 6,
-        "july": 7,
-        "august": 8,
-        "september": 9,
-        "october": 10,
-        "november": 11,
-        "december": 12,
-    }
-    for m in re.finditer(
-        r"\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s*(20\d{2})\b",
-        s,
-        flags=re.IGNORECASE,
-    ):
-        mo = month_map.get((m.group(1) or "").lower(), 0)
-        d = int(m.group(2))
-        y = int(m.group(3))
-        norm = _normalize_date_parts(y, mo, d)
-        if norm:
-            out.append(norm)
-
-    # de-dup keep order
-    seen: set[str] = set()
-    uniq: list[str] = []
-    for d in out:
-        if d in seen:
-            continue
-        seen.add(d)
-        uniq.append(d)
-    return uniq
+
+# Source titles/snippets come back unchanged on follow-ups and retries.
+@lru_cache(maxsize=1024)
+def _date_candidates(text: str) -> tuple[str, ...]:
+    numeric: list[str] = []
+    english: list[str] = []
+    for m in _RE_DATES.finditer(text):
+        if m.group(1) is not None:
+            norm = _normalize_date_parts(int(m.group(1)), int(m.group(2)), int(m.group(3) or 1))
+            if norm:
+                numeric.append(norm)
+        else:
+            norm = _normalize_date_parts(int(m.group(6)), _MONTHS_EN.get(m.group(4).lower(), 0), int(m.group(5)))
+            if norm:
+                english.append(norm)
+
+    # Numeric dates first, then English ones, de-duplicated in order.
+    return tuple(dict.fromkeys(numeric + english))
 
 
 def _build_source_date_hints(search_results: list[dict], fetched_pages: list[dict]) -> tuple[dict[int, str], set[str]]:
@@ -904,17 +1114,20 @@ def _build_source_date_hints(search_results: list[dict], fetched_pages: list[dic
         sr = search_results[i - 1] if i - 1 < len(search_results) else {}
         fp = fetched_pages[i - 1] if i - 1 < len(fetched_pages) else {}
 
-        text_parts = [
-            str(sr.get("title") or ""),
-            str(sr.get("description") or ""),
-            str(fp.get("title") or ""),
+        # Only the first candidate is used, so stop at the first part that has one.
+        text_parts = (
+            sr.get("title"),
+            sr.get("description"),
+            fp.get("title"),
             str(fp.get("text") or "")[:1500],
-        ]
-        dates: list[str] = []
+        )
+        date_value = "[未提供日期]"
         for part in text_parts:
-            dates.extend(_extract_date_candidates(part))
+            dates = _date_candidates(str(part or ""))
+            if dates:
+                date_value = dates[0]
+                break
 
-        date_value = dates[0] if dates else "[未提供日期]"
         hints[i] = date_value
         if date_value != "[未提供日期]":
             allowed_dates.add(date_value)
@@ -922,35 +1135,111 @@ def _build_source_date_hints(search_results: list[dict], fetched_pages: list[dic
     return hints, allowed_dates
 
 
-def _extract_news_bullet_dates(text: str) -> list[str]:
-    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip().startswith(("-", "•", "*"))]
-    out: list[str] = []
-    for ln in lines:
+def _iter_news_bullet_dates(text: str, lines: list[str] | None = None) -> Iterator[str]:
+    for ln in _bullet_lines(text) if lines is None else lines:
         head = ln[:80]
         if "未提供日期" in head:
-            out.append("[未提供日期]")
+            yield "[未提供日期]"
             continue
-        found = _extract_date_candidates(head)
+        found = _date_candidates(head)
         if found:
-            out.append(found[0])
-    return out
+            yield found[0]
 
 
-def _news_dates_grounded_in_sources(text: str, allowed_dates: set[str]) -> bool:
-    bullet_dates = _extract_news_bullet_dates(text)
-    if not bullet_dates:
-        return False
-    for d in bullet_dates:
-        if d == "[未提供日期]":
-            continue
-        if d not in allowed_dates:
+def _news_dates_grounded_in_sources(text: str, allowed_dates: set[str], lines: list[str] | None = None) -> bool:
+    # Lazy so the scan stops at the first bullet with an ungrounded date.
+    found = False
+    for d in _iter_news_bullet_dates(text, lines):
+        found = True
+        if d != "[未提供日期]" and d not in allowed_dates:
             return False
-    return True
+    return found
 
 
-def _is_weather_refusal(text: str) -> bool:
-    t = (text or "").lower()
-    patterns = [
+_NEWS_RETRY_RULES = {
+    "date_prefix": "Every item needs its publication date (YYYY-MM-DD), or [未提供日期] if the source has none.",
+    "date_grounding": "Use only dates from the source-date hints; do NOT fabricate dates.",
+    "citations": "Each item must cite a different source index; do not cite only [1].",
+    "stale_year": "Use only very recent updates from the provided sources; drop items from earlier years.",
+}
+
+
+def _news_prose_violations(text: str, *, allowed_dates: set[str], max_index: int, recent: bool) -> list[str]:
+    # The bullet scan is shared by the three bullet checks.
+    lines = _bullet_lines(text)
+    violations: list[str] = []
+    if not _news_output_has_date_prefix(text, lines):
+        violations.append("date_prefix")
+    if not _news_dates_grounded_in_sources(text, allowed_dates, lines):
+        violations.append("date_grounding")
+    if not _news_has_diverse_citations(text, max_index, lines):
+        violations.append("citations")
+    if recent and _contains_stale_year_for_recent(text):
+        violations.append("stale_year")
+    return violations
+
+
+def _news_retry_message(violations: list[str]) -> dict:
+    rules = ["Reply with JSON only, matching the news_items schema."]
+    rules.extend(_NEWS_RETRY_RULES[v] for v in violations)
+    return {
+        "role": "system",
+        "content": "Your previous news output is invalid. Fix all of the following in one reply:\n"
+        + "\n".join(f"- {r}" for r in rules),
+    }
+
+
+def _parse_news_items(
+    raw: str,
+    *,
+    max_index: int,
+    source_date_hints: dict[int, str],
+    allowed_dates: set[str],
+) -> list[dict[str, object]] | None:
+    obj = _extract_first_json_object(raw)
+    if not obj:
+        return None
+    try:
+        data = jsonutil.loads(obj)
+    except jsonutil.JSONDecodeError:
+        return None
+    items_raw = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items_raw, list):
+        return None
+
+    # Dates and citations are fixed up here, so the rendered list is grounded and diverse by construction.
+    items: list[dict[str, object]] = []
+    seen: set[int] = set()
+    for item in items_raw:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get("citation") or 0)
+        except (TypeError, ValueError):
+            continue
+        if i < 1 or i > max_index or i in seen:
+            continue
+        headline = _sanitize_non_numeric_citations(str(item.get("headline") or "")).strip()
+        summary = _RE_CITATION.sub("", _sanitize_non_numeric_citations(str(item.get("summary") or ""))).strip()
+        if not headline and not summary:
+            continue
+        dates = _date_candidates(str(item.get("date") or ""))
+        date = dates[0] if dates and dates[0] in allowed_dates else source_date_hints.get(i) or "[未提供日期]"
+        seen.add(i)
+        items.append({"date": date, "headline": headline, "summary": summary, "citation": i})
+    return items or None
+
+
+def _render_news_items(items: list[dict[str, object]]) -> str:
+    lines: list[str] = []
+    for item in items:
+        body = "：".join(p for p in (str(item["headline"]), str(item["summary"])) if p)
+        lines.append(f"- {item['date']} {body} [{item['citation']}]")
+    return "\n".join(lines)
+
+
+_WEATHER_REFUSAL_RE = _keyword_re(
+    (
         "無法提供最新",
         "无法提供最新",
         "無法提供即時",
@@ -960,86 +1249,419 @@ def _is_weather_refusal(text: str) -> bool:
         "unable to provide",
         "無法查詢",
         "无法查询",
-    ]
-    return any(p in t for p in patterns)
-
-
-def _is_weather_question(user_text: str) -> bool:
-    t = user_text.lower()
-    keywords = [
-        "天氣",
-        "天气",
-        "氣象",
-        "氣温",
-        "气温",
-        "溫度",
-        "温度",
-        "降雨",
-        "下雨",
-        "雷雨",
-        "颱風",
-        "台风",
-        "降雨機率",
-        "降雨概率",
-    ]
-    return any(k in t for k in keywords)
+    ),
+    re.IGNORECASE,
+)
+
+
+def _is_weather_refusal(text: str) -> bool:
+    # Runs on whole model replies: one case-insensitive scan, no lowercased copy.
+    return _WEATHER_REFUSAL_RE.search(text or "") is not None
+
+
+_WEATHER_KEYWORDS = (
+    "天氣",
+    "天气",
+    "氣象",
+    "氣温",
+    "气温",
+    "溫度",
+    "温度",
+    "降雨",
+    "下雨",
+    "雷雨",
+    "颱風",
+    "台风",
+    "降雨機率",
+    "降雨概率",
+)
+
+
+_TW_LOC_PATTERNS = (
+    re.compile(r"的([\u4e00-\u9fff]{1,20}?)(?:天氣|天气|氣象|气象|降雨|溫度|温度)"),
+    re.compile(r"(?:今天|今日|目前|現在|最新)?\s*([\u4e00-\u9fff]{2,20}?)(?:天氣|天气|氣象|气象|降雨機率|降雨|溫度|温度)"),
+)
+_RE_LOC_LEAD_IN = re.compile(r"^(我想問|請問|想問|幫我查|查一下|查詢)")
+_LOC_NON_PLACES = frozenset({"今天", "今日", "目前", "現在", "最新", "天氣", "天气"})
 
 
 def _extract_tw_location(user_text: str) -> str:
-    # 1) Known Taiwan cities/counties first.
-    for loc in _TW_LOCATIONS:
-        if loc in user_text:
-            return loc
+    # 1) Known Taiwan cities/counties first (earliest mention wins).
+    m = _TW_LOCATION_RE.search(user_text)
+    if m:
+        return m.group(0)
 
     # 2) Generic Chinese location patterns for non-TW cities (e.g., 蘇州、上海).
-    patterns = [
-        r"的([\u4e00-\u9fff]{1,20}?)(?:天氣|天气|氣象|气象|降雨|溫度|温度)",
-        r"(?:今天|今日|目前|現在|最新)?\s*([\u4e00-\u9fff]{2,20}?)(?:天氣|天气|氣象|气象|降雨機率|降雨|溫度|温度)",
-    ]
-    for p in patterns:
-        m = re.search(p, user_text)
+    for p in _TW_LOC_PATTERNS:
+        m = p.search(user_text)
         if not m:
             continue
         cand = (m.group(1) or "").strip()
-        cand = re.sub(r"^(我想問|請問|想問|幫我查|查一下|查詢)", "", cand).strip()
+        cand = _RE_LOC_LEAD_IN.sub("", cand).strip()
         cand = cand.replace("的", "").strip()
-        if cand and cand not in {"今天", "今日", "目前", "現在", "最新", "天氣", "天气"}:
+        if cand and cand not in _LOC_NON_PLACES:
             return cand
 
     return ""
 
 
-def _should_force_web_search(user_text: str) -> bool:
-    t = user_text.lower()
-    keywords = [
-        "天氣",
-        "天气",
-        "新聞",
-        "新闻",
-        "news",
-        "軍演",
-        "军演",
-        "海域",
-        "時事",
-        "时事",
-        "最近",
-        "近日",
-        "氣象",
-        "温度",
-        "溫度",
-        "下雨",
-        "降雨",
-        "雷雨",
-        "颱風",
-        "台风",
-        "即時",
-        "实时",
-        "今天",
-        "現在",
-        "目前",
-        "最新",
-    ]
-    return any(k in t for k in keywords)
+_FORCE_SEARCH_KEYWORDS = (
+    "天氣",
+    "天气",
+    "新聞",
+    "新闻",
+    "news",
+    "軍演",
+    "军演",
+    "海域",
+    "時事",
+    "时事",
+    "最近",
+    "近日",
+    "氣象",
+    "温度",
+    "溫度",
+    "下雨",
+    "降雨",
+    "雷雨",
+    "颱風",
+    "台风",
+    "即時",
+    "实时",
+    "今天",
+    "現在",
+    "目前",
+    "最新",
+)
+
+
+_RE_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def _estimate_tokens(text: str) -> int:
+    # Rough count without a tokenizer: CJK chars are ~1 token each, other text ~4 chars per token.
+    cjk = len(_RE_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4 + 4
+
+
+class _ChatHistory:
+    # Fixed-size ring buffer: window() slices straight out of it instead of copying the whole history first.
+    def __init__(self, maxlen: int):
+        self._cap = max(0, int(maxlen))
+        self._items: list[dict | None] = [None] * self._cap
+        self._tokens: list[int] = [0] * self._cap
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return iter(self._slice(self._size))
+
+    def append(self, message: dict) -> None:
+        if not self._cap:
+            return
+        i = (self._head + self._size) % self._cap
+        self._items[i] = message
+        self._tokens[i] = _estimate_tokens(str(message.get("content") or ""))
+        if self._size < self._cap:
+            self._size += 1
+        else:
+            self._head = (self._head + 1) % self._cap
+
+    def extend(self, messages) -> None:
+        for m in messages:
+            self.append(m)
+
+    def clear(self) -> None:
+        self._items = [None] * self._cap
+        self._tokens = [0] * self._cap
+        self._head = 0
+        self._size = 0
+
+    def oldest(self, n: int) -> list[dict]:
+        n = min(max(0, n), self._size)
+        end = self._head + n
+        if end <= self._cap:
+            return self._items[self._head : end]
+        return self._items[self._head :] + self._items[: end - self._cap]
+
+    def drop_oldest(self, n: int) -> None:
+        # Advances the head instead of rebuilding the buffer; slots are released for GC.
+        n = min(max(0, n), self._size)
+        for _ in range(n):
+            self._items[self._head] = None
+            self._head = (self._head + 1) % self._cap
+        self._size -= n
+
+    def _slice(self, n: int) -> list[dict]:
+        # The newest n messages, oldest first.
+        start = (self._head + self._size - n) % self._cap if self._cap else 0
+        end = start + n
+        if end <= self._cap:
+            return self._items[start:end]
+        return self._items[start:] + self._items[: end - self._cap]
+
+    def window(self, token_budget: int) -> list[dict]:
+        # Newest messages that fit the budget; the latest one is always kept.
+        if token_budget <= 0:
+            return self._slice(self._size)
+        total = 0
+        n = 0
+        while n < self._size:
+            t = self._tokens[(self._head + self._size - 1 - n) % self._cap]
+            if n and total + t > token_budget:
+                break
+            total += t
+            n += 1
+        return self._slice(n)
+
+
+_RE_CONTEXT_REF = re.compile(r"\b(?:that|this|it|they|them|these|those)\b|[他她它這这那]", re.IGNORECASE)
+
+
+def _same_search_query(a: str, b: str) -> bool:
+    return " ".join(a.split()).casefold() == " ".join(b.split()).casefold()
+
+
+def _discard_task(task: asyncio.Task) -> None:
+    task.cancel()
+    # Retrieve the outcome so a task that already failed does not log "exception was never retrieved".
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+_NEWS_LIKE_KEYWORDS = (
+    "新聞",
+    "新闻",
+    "news",
+    "頭條",
+    "头条",
+    "最近",
+    "近日",
+    "最新",
+    "headline",
+)
+
+_NEWS_KEYWORDS = (
+    "新聞",
+    "新闻",
+    "news",
+    "headline",
+    "頭條",
+    "头条",
+    "兩岸",
+    "两岸",
+    "國際",
+    "国际",
+    "財經",
+    "财经",
+    "金融",
+    "finance",
+)
+
+_TODAY_MARKERS = ("今天", "今日")
+_RECENT_TIME_MARKERS = ("最近", "近日", "最新")
+_DOW_JONES_KEYWORDS = ("道瓊", "道琼", "dow jones", "djia")
+_NVIDIA_KEYWORDS = ("輝達", "英偉達", "nvidia")
+_BAIDU_KEYWORDS = ("百度", "baidu", "bidu")
+
+
+def _build_keyword_tagger(groups: dict[str, tuple[str, ...]]) -> tuple[re.Pattern[str], dict[str, frozenset[str]]]:
+    direct: dict[str, set[str]] = {}
+    for tag, keywords in groups.items():
+        for k in keywords:
+            direct.setdefault(k, set()).add(tag)
+    # The lookahead reports only the longest keyword at each position, so a keyword also carries
+    # the tags of every keyword contained in it; that keeps the result identical to separate scans.
+    tags = {k: frozenset(t for j, jt in direct.items() if j in k for t in jt) for k in direct}
+    alternation = "|".join(re.escape(k) for k in sorted(direct, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), tags
+
+
+_MESSAGE_TAG_RE, _MESSAGE_KEYWORD_TAGS = _build_keyword_tagger(
+    {
+        "weather": _WEATHER_KEYWORDS,
+        "links": _LINK_KEYWORDS,
+        "force_web": _FORCE_SEARCH_KEYWORDS,
+        "recent": _RECENT_MARKERS,
+        "recent_topic": _RECENT_NEWS_TOPIC_MARKERS,
+        "market": _MARKET_INDEX_KEYWORDS,
+        "news_like": _NEWS_LIKE_KEYWORDS,
+        "news": _NEWS_KEYWORDS,
+        "today": _TODAY_MARKERS,
+        "recent_time": _RECENT_TIME_MARKERS,
+        "dow_jones": _DOW_JONES_KEYWORDS,
+        "nvidia": _NVIDIA_KEYWORDS,
+        "baidu": _BAIDU_KEYWORDS,
+    }
+)
+
+
+@lru_cache(maxsize=256)
+def _message_tags(user_text: str) -> frozenset[str]:
+    # One scan of the message for every keyword-based classifier.
+    tags: set[str] = set()
+    for m in _MESSAGE_TAG_RE.finditer(_maybe_lower(user_text)):
+        tags |= _MESSAGE_KEYWORD_TAGS[m.group(1)]
+    return frozenset(tags)
+
+
+def _fallback_search_query(user_text: str, *, is_news_like: bool) -> str:
+    # Rewrites for non-weather searches when the planner gave no query.
+    tags = _message_tags(user_text)
+    # Bias "today" news queries toward recency.
+    if is_news_like and "today" in tags:
+        return f"{user_text} 過去 24 小時"
+    if "market" in tags and "dow_jones" in tags:
+        return "Dow Jones Industrial Average latest close past 5 trading days"
+    return ""
+
+
+_SYS_BOT_PROMPT = "You are a helpful Telegram chatbot."
+
+_SYS_SUMMARIZE_SOURCE = {
+    "role": "system",
+    "content": (
+        "You are summarizing a single web source for a Telegram bot. "
+        "Return concise Traditional Chinese bullet points that are directly relevant to the user's question. "
+        "Do NOT include URLs. Do NOT mention you cannot browse. "
+        "If the source does not contain relevant information, say so briefly. "
+        "For each bullet, include the source publication date at the beginning when available (YYYY-MM-DD). "
+        "If no date is found in the source, begin with '[未提供日期]'. "
+        "End each bullet with the citation marker like [n] where n is the source index."
+    ),
+}
+
+_SYS_SUMMARIZE_SOURCES = {
+    "role": "system",
+    "content": (
+        "You are summarizing several web sources for a Telegram bot. "
+        "For EACH source, write concise Traditional Chinese bullet points that are directly relevant to the user's question. "
+        "Do NOT include URLs. Do NOT mention you cannot browse. "
+        "If a source does not contain relevant information, say so briefly. "
+        "For each bullet, include the source publication date at the beginning when available (YYYY-MM-DD). "
+        "If no date is found in the source, begin with '[未提供日期]'. "
+        "End each bullet with the citation marker like [n] where n is the source index. "
+        "Reply with JSON only: one entry per source with its index and summary."
+    ),
+}
+
+_SUMMARIES_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "source_summaries",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summaries": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "summary": {"type": "string"},
+                        },
+                        "required": ["index", "summary"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["summaries"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Total source text sent in one batched summary request, split evenly across sources.
+_BATCH_SUMMARY_CHARS = 24_000
+
+_SYS_WEATHER_REFUSAL_RETRY = {
+    "role": "system",
+    "content": (
+        "Your previous answer is invalid because it refused real-time weather. "
+        "You must answer using current provided sources and citations [n]. "
+        "Do NOT refuse. Do NOT say you cannot provide real-time info. "
+        "If exact numbers are unavailable, explicitly state 'sources do not contain the detailed forecast numbers'. "
+        "Use Traditional Chinese with sections: 概況 / 溫度範圍 / 降雨機率 / 注意事項."
+    ),
+}
+
+_SYS_ZH_HANT_REWRITE = {
+    "role": "system",
+    "content": (
+        "Rewrite the text into Traditional Chinese (繁體中文) only. "
+        "Keep meaning, structure, citations like [n], and URLs unchanged. "
+        "Do not add or remove facts."
+    ),
+}
+
+_SYS_STALE_NEWS_RETRY = {
+    "role": "system",
+    "content": (
+        "Your previous answer is invalid for a recent-news query because it used stale timeline years. "
+        "Re-answer using only very recent updates from provided sources. "
+        "If provided sources do not clearly support events in the last few days, explicitly say so and ask user whether to broaden the time range. "
+        "Do NOT fabricate dates. Keep citations [n]."
+    ),
+}
+
+_NEWS_ITEMS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "news_items",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "date": {"type": "string"},
+                            "headline": {"type": "string"},
+                            "summary": {"type": "string"},
+                            "citation": {"type": "integer"},
+                        },
+                        "required": ["date", "headline", "summary", "citation"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+_RE_QUERY_TERM = re.compile(r"[a-z0-9]{2,}|[\u3400-\u9fff]{2,}")
+_RELEVANCE_SCAN_CHARS = 2000
+
+
+def _query_ngrams(*texts: str) -> set[str]:
+    out: set[str] = set()
+    for text in texts:
+        for term in _RE_QUERY_TERM.findall(_maybe_lower(text or "")):
+            if term.isascii():
+                out.add(term)
+            else:
+                out.update(term[i : i + 2] for i in range(len(term) - 1))
+    return out
+
+
+def _looks_relevant(ngrams: set[str], title: str, text: str) -> bool:
+    if not ngrams:
+        return True
+    hay = _maybe_lower(f"{title}\n{text[:_RELEVANCE_SCAN_CHARS]}")
+    return any(ng in hay for ng in ngrams)
+
+
+def _source_summary_key(intent: str, index: int, url: str, content: str) -> str:
+    # The index is part of the key because summaries carry their [n] citation marker.
+    h = hashlib.sha256(f"{intent}|{index}|{url}|".encode("utf-8"))
+    h.update(content[:4096].encode("utf-8", "ignore"))
+    return h.hexdigest()[:16]
 
 
 async def _summarize_source(
@@ -1057,18 +1679,7 @@ async def _summarize_source(
         temperature=0.2,
         max_tokens=450,
         messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are summarizing a single web source for a Telegram bot. "
-                    "Return concise Traditional Chinese bullet points that are directly relevant to the user's question. "
-                    "Do NOT include URLs. Do NOT mention you cannot browse. "
-                    "If the source does not contain relevant information, say so briefly. "
-                    "For each bullet, include the source publication date at the beginning when available (YYYY-MM-DD). "
-                    "If no date is found in the source, begin with '[未提供日期]'. "
-                    "End each bullet with the citation marker like [n] where n is the source index."
-                ),
-            },
+            _SYS_SUMMARIZE_SOURCE,
             {
                 "role": "user",
                 "content": (
@@ -1083,14 +1694,103 @@ async def _summarize_source(
     )
 
 
+async def _summarize_sources(
+    lm: LMStudioClient,
+    *,
+    model: str,
+    user_text: str,
+    sources: list[tuple[int, str, str, str]],
+    request_id: str | None = None,
+) -> dict[int, str]:
+    # One request for all sources: the system prompt and HTTP round-trip are paid once.
+    per_source = max(1500, _BATCH_SUMMARY_CHARS // max(1, len(sources)))
+    payload = [
+        {"index": i, "title": title, "domain": domain, "content": text[:per_source]}
+        for i, title, domain, text in sources
+    ]
+    raw = await lm.chat_completions(
+        model=model,
+        temperature=0.2,
+        max_tokens=450 * len(sources),
+        response_format=_SUMMARIES_RESPONSE_FORMAT,
+        request_id=request_id,
+        messages=[
+            _SYS_SUMMARIZE_SOURCES,
+            {
+                "role": "user",
+                "content": (
+                    f"User question: {user_text}\n\n"
+                    f"Sources (JSON):\n{jsonutil.dumps(payload).decode('utf-8')}"
+                ),
+            },
+        ],
+    )
+    data = jsonutil.loads(_extract_first_json_object(raw) or raw)
+    wanted = {i for i, *_ in sources}
+    out: dict[int, str] = {}
+    for item in data.get("summaries") or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        summary = str(item.get("summary") or "").strip()
+        if i in wanted and summary:
+            out[i] = summary
+    return out
+
+
+async def _stream_reply(
+    lm: LMStudioClient,
+    reply_to: Message,
+    *,
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    request_id: str,
+) -> tuple[str, Message | None, str]:
+    # Show the answer while it decodes: one message, edited at most every 300ms once 40+ new chars arrive.
+    text = ""
+    shown = ""
+    sent: Message | None = None
+    last_edit = 0.0
+    async for delta in lm.stream_chat_completions(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        request_id=request_id,
+    ):
+        text += delta
+        now = time.monotonic()
+        if not text.strip():
+            continue
+        if sent is not None and (now - last_edit < 0.3 or len(text) - len(shown) < 40):
+            continue
+        preview = text[:4096]
+        try:
+            if sent is None:
+                sent = await reply_to.reply_text(preview, disable_web_page_preview=True)
+            else:
+                await sent.edit_text(preview, disable_web_page_preview=True)
+            shown = preview
+        except Exception:
+            pass
+        last_edit = now
+    return text, sent, shown
+
+
 def _format_search_results(results: list[dict]) -> str:
-    lines: list[str] = []
-    for i, r in enumerate(results, start=1):
-        title = (r.get("title") or "").strip()
-        url = (r.get("url") or "").strip()
-        desc = (r.get("description") or "").strip()
-        lines.append(f"[{i}] {title}\nDomain: {_domain(url)}\nSnippet: {desc}")
-    return "\n\n".join(lines)
+    return "\n\n".join(
+        f"[{i}] {(r.get('title') or '').strip()}\n"
+        f"Domain: {_domain((r.get('url') or '').strip())}\n"
+        f"Snippet: {(r.get('description') or '').strip()}"
+        for i, r in enumerate(results, start=1)
+    )
+
+
+# Extracted pages shorter than this are error stubs or cookie walls; they only cost prompt tokens.
+_MIN_PAGE_CHARS = 200
 
 
 def _format_fetched_pages(pages: list[dict]) -> str:
@@ -1099,24 +1799,69 @@ def _format_fetched_pages(pages: list[dict]) -> str:
         title = (p.get("title") or "").strip()
         url = (p.get("url") or "").strip()
         text = (p.get("text") or "").strip()
-        if not text:
+        if len(text) < _MIN_PAGE_CHARS:
             continue
         lines.append(f"[{i}] {title}\nDomain: {_domain(url)}\nContent:\n{text}")
     return "\n\n".join(lines)
 
 
+def _fetch_plan(search_results: list[dict], top_n: int) -> list[tuple[dict, bool]]:
+    # One slot per result so page [i] still lines up with search result [i]; repeat domains are not fetched.
+    plan: list[tuple[dict, bool]] = []
+    seen: set[str] = set()
+    for item in search_results[: top_n * 2]:
+        if len(seen) >= top_n:
+            break
+        url = (item.get("url") or "").strip()
+        d = _domain(url) if url else ""
+        fetch = bool(d) and d not in seen
+        if fetch:
+            seen.add(d)
+        plan.append((item, fetch))
+    return plan
+
+
+_PLAN_CACHE_MAX = 1024
+_SUMMARY_CACHE_MAX = 128
+_SOURCE_SUMMARY_CACHE_MAX = 512
+_WEB_CONTEXT_MAX_CHATS = 1024
+_WEB_CONTEXT_TTL_S = 1800.0
+_NEWS_SUMMARY_CACHE_TTL_S = 600.0
+_SUMMARY_CACHE_TTL_S = 3600.0
+_PAGE_CACHE_TTL_S = 900.0
+_PAGE_CACHE_MAX_ENTRIES = 256
+
+
 async def run_bot(settings: Settings) -> None:
     dbg = debug_logger_from_settings(settings)
 
-    lm = LMStudioClient(settings.lmstudio_base_url, debug_logger=dbg)
+    # One pooled client for LM Studio and Brave so repeated calls reuse warm connections.
+    api_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    lm = LMStudioClient(
+        settings.lmstudio_base_url,
+        debug_logger=dbg,
+        client=api_client,
+        max_concurrency=int(getattr(settings, "lmstudio_max_concurrency", 4) or 4),
+    )
     brave = BraveSearchClient(
         settings.brave_api_key,
         debug_logger=dbg,
+        client=api_client,
+        max_concurrency=int(getattr(settings, "brave_max_concurrency", 3) or 3),
         mcp_enabled=getattr(settings, "mcp_brave_enabled", False),
         mcp_command=getattr(settings, "mcp_brave_command", "npx"),
         mcp_args=getattr(settings, "mcp_brave_args", None),
     )
-    fetch_client = httpx.AsyncClient(timeout=12.0)
+    fetch_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(12.0, connect=4.0),
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0),
+        headers={"User-Agent": "telegram-bot/1.0"},
+    )
 
     import os
 
@@ -1124,6 +1869,47 @@ async def run_bot(settings: Settings) -> None:
 
     fetch_top_n = int(getattr(settings, "fetch_top_n", 10) or 10)
     fetch_max_chars = int(getattr(settings, "fetch_max_chars", 8000) or 8000)
+    fetch_sem = asyncio.Semaphore(int(getattr(settings, "fetch_concurrency", 8) or 8))
+
+    # Popular result URLs recur across chats and follow-ups; keep their text for a while and let
+    # concurrent requests for the same URL share one download.
+    page_cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+    page_inflight: dict[str, asyncio.Task[str]] = {}
+
+    async def _download_page(url: str) -> str:
+        async with fetch_sem:
+            try:
+                text = await _fetch_page_text(fetch_client, url=url, max_chars=fetch_max_chars)
+            except Exception:
+                return ""
+        if text:
+            page_cache[url] = (time.monotonic(), text)
+            page_cache.move_to_end(url)
+            while len(page_cache) > _PAGE_CACHE_MAX_ENTRIES:
+                page_cache.popitem(last=False)
+        return text
+
+    async def _page_text(url: str) -> str:
+        hit = page_cache.get(url)
+        if hit is not None:
+            if time.monotonic() - hit[0] <= _PAGE_CACHE_TTL_S:
+                page_cache.move_to_end(url)
+                return hit[1]
+            del page_cache[url]
+        task = page_inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(_download_page(url))
+            page_inflight[url] = task
+            task.add_done_callback(lambda _t: page_inflight.pop(url, None))
+        # Shielded so one cancelled waiter does not abort the download for the others.
+        return await asyncio.shield(task)
+
+    async def _fetch_one(item: dict, fetch: bool = True) -> dict:
+        url = (item.get("url") or "").strip()
+        if not fetch:
+            return {"title": item.get("title") or "", "url": url, "text": ""}
+        return {"title": item.get("title") or "", "url": url, "text": await _page_text(url)}
+
     news_max_items = int(getattr(settings, "news_max_items", 8) or 8)
     news_followup_default_count = int(getattr(settings, "news_followup_default_count", 5) or 5)
 
@@ -1131,9 +1917,19 @@ async def run_bot(settings: Settings) -> None:
         memory_dir=settings.memory_dir,
         mode=settings.memory_mode,
         days=settings.memory_days,
+        fmt=settings.memory_format,
     )
-    recent: dict[int, deque[dict]] = defaultdict(lambda: deque(maxlen=settings.recent_turns * 2))
-    last_web_context: dict[int, dict[str, object]] = {}
+    recent: dict[int, _ChatHistory] = defaultdict(partial(_ChatHistory, settings.recent_turns * 2))
+    # Updates are handled concurrently; this keeps each chat's turns strictly in order.
+    chat_locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+    recent_tokens_budget = int(getattr(settings, "recent_tokens_budget", 4000) or 0)
+    # Follow-ups only reuse a recent search; idle chats age out instead of pinning their pages.
+    last_web_context: OrderedDict[int, dict[str, object]] = OrderedDict()
+    # The planner only sees the message text, so stock phrases can reuse an earlier decision.
+    plan_cache: OrderedDict[str, dict] = OrderedDict()
+    # Same existing summary + same turns to fold in -> same result; skip the LLM call.
+    summary_cache: OrderedDict[str, str] = OrderedDict()
+    source_summary_cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
     pending_spec_upload: set[int] = set()
 
     def _spec_dir(chat_id: int) -> str:
@@ -1629,9 +2425,14 @@ async def run_bot(settings: Settings) -> None:
         await update.message.reply_text(text, disable_web_page_preview=True)
 
     async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        if not update.message or not update.message.text:
+        # isspace() rejects blank messages without building a stripped copy or taking the chat lock.
+        if not update.message or not update.message.text or update.message.text.isspace():
             return
 
+        async with chat_locks[update.effective_chat.id]:
+            await _handle_message(update, context)
+
+    async def _handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         chat_id = update.effective_chat.id
         user_text = update.message.text.strip()
 
@@ -1646,9 +2447,16 @@ async def run_bot(settings: Settings) -> None:
             if not user_text:
                 return
 
+        # Lowercased once here; the keyword helpers below take it instead of lowercasing again.
+        user_text_lc = _maybe_lower(user_text)
+
+        # The in-memory window is authoritative; only load persisted turns the first time a chat is seen.
+        if chat_id not in recent:
+            recent[chat_id].extend(await memory.recent_turns(chat_id=chat_id, limit=settings.recent_turns * 2))
+
         # Deterministic time/date answers (do not ask the LLM).
-        if _is_time_question(user_text):
-            assistant_text = _answer_time_question(user_text)
+        if _is_time_question(user_text, user_text_lc):
+            assistant_text = _answer_time_question(user_text, user_text_lc)
             state = _profile_state_update(profile={}, updates={"topic": "time", "time_range": "today"})
             try:
                 existing_profile = await memory.get_profile(chat_id=chat_id)
@@ -1664,7 +2472,7 @@ async def run_bot(settings: Settings) -> None:
                     data={"chat_id": chat_id, "user_text": user_text, "assistant_text": assistant_text},
                 )
             recent[chat_id].append({"role": "assistant", "content": assistant_text})
-            await memory.add_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
+            memory.queue_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
             await update.message.reply_text(assistant_text, disable_web_page_preview=True)
             return
 
@@ -1681,49 +2489,84 @@ async def run_bot(settings: Settings) -> None:
             )
 
         recent[chat_id].append({"role": "user", "content": user_text})
-        await memory.add_turn(chat_id=chat_id, role="user", content=user_text, ts=time.time())
+        memory.queue_turn(chat_id=chat_id, role="user", content=user_text, ts=time.time())
 
-        persisted = await memory.recent_turns(chat_id=chat_id, limit=settings.recent_turns * 2)
-        recent[chat_id].clear()
-        recent[chat_id].extend(persisted)
+        msg_tags = _message_tags(user_text)
+        is_weather_q = "weather" in msg_tags
+        wants_links = "links" in msg_tags
+        force_web_search = "force_web" in msg_tags
+        is_news_like = "news_like" in msg_tags
+        is_recent_news_q = "recent" in msg_tags and "recent_topic" in msg_tags
 
-        profile = await memory.get_profile(chat_id=chat_id)
-        profile_updates = _infer_profile_updates(user_text)
-        if _is_weather_question(user_text):
-            detected_loc = _extract_tw_location(user_text)
-            if detected_loc:
-                profile_updates["default_weather_location"] = _normalize_location(detected_loc)
-        if profile_updates:
-            profile = await memory.upsert_profile(chat_id=chat_id, updates=profile_updates)
-            if dbg.enabled:
-                dbg.write_json(
+        # A) Follow-up continuation: reuse last web_search context for news.
+        is_followup = _is_followup_continue(user_text, user_text_lc)
+        prev_ctx = last_web_context.get(chat_id) or {}
+        if prev_ctx and time.time() - float(prev_ctx.get("ts") or 0) > _WEB_CONTEXT_TTL_S:
+            last_web_context.pop(chat_id, None)
+            prev_ctx = {}
+
+        # Short, self-contained messages that force a search anyway gain nothing from the planner.
+        skip_planner = force_web_search and len(user_text) < 80 and not _RE_CONTEXT_REF.search(user_text)
+
+        # Search is forced regardless of the plan, so start it now and let it overlap the profile I/O and
+        # the planner. Without a planner the final query is already known; otherwise guess the raw text.
+        speculative_search: asyncio.Task[list[dict]] | None = None
+        speculative_query = ""
+        if (
+            force_web_search
+            and not is_weather_q
+            and not (is_followup and prev_ctx.get("tool") == "web_search" and bool(prev_ctx.get("is_news")))
+        ):
+            speculative_query = user_text
+            if skip_planner:
+                speculative_query = _fallback_search_query(user_text, is_news_like=is_news_like) or user_text
+            speculative_search = asyncio.create_task(
+                brave.web_search(
+                    query=speculative_query,
+                    country=settings.brave_country,
+                    lang=settings.brave_lang,
+                    count=int(getattr(settings, "brave_count", 10) or 10),
+                    fresh=is_news_like,
                     request_id=request_id,
-                    name="memory_profile_update",
-                    data={"chat_id": chat_id, "updates": profile_updates, "profile": profile},
                 )
+            )
 
-        plan = await llm_plan_tools(lm, model=settings.lmstudio_planner_model, user_text=user_text)
+        try:
+            profile = await memory.get_profile(chat_id=chat_id)
+            profile_updates = _infer_profile_updates(user_text, user_text_lc)
+            if is_weather_q:
+                detected_loc = _extract_tw_location(user_text)
+                if detected_loc:
+                    profile_updates["default_weather_location"] = _normalize_location(detected_loc)
+            if profile_updates:
+                profile = await memory.upsert_profile(chat_id=chat_id, updates=profile_updates)
+                if dbg.enabled:
+                    dbg.write_json(
+                        request_id=request_id,
+                        name="memory_profile_update",
+                        data={"chat_id": chat_id, "updates": profile_updates, "profile": profile},
+                    )
+
+            if skip_planner:
+                plan = {"tool": "web_search", "query": ""}
+            else:
+                plan_key = user_text_lc[:256]
+                cached_plan = plan_cache.get(plan_key)
+                if cached_plan is not None:
+                    plan_cache.move_to_end(plan_key)
+                    plan = dict(cached_plan)
+                else:
+                    plan = await llm_plan_tools(lm, model=settings.lmstudio_planner_model, user_text=user_text)
+                    plan_cache[plan_key] = dict(plan)
+                    if len(plan_cache) > _PLAN_CACHE_MAX:
+                        plan_cache.popitem(last=False)
+        except BaseException:
+            if speculative_search is not None:
+                _discard_task(speculative_search)
+            raise
         tool = (plan.get("tool") or "none").strip()
         query = (plan.get("query") or "").strip()
 
-        is_news_like = any(
-            k in user_text.lower()
-            for k in [
-                "新聞",
-                "新闻",
-                "news",
-                "頭條",
-                "头条",
-                "最近",
-                "近日",
-                "最新",
-                "headline",
-            ]
-        )
-
-        # A) Follow-up continuation: reuse last web_search context for news.
-        is_followup = _is_followup_continue(user_text)
-        prev_ctx = last_web_context.get(chat_id) or {}
         if is_followup and prev_ctx.get("tool") == "web_search" and bool(prev_ctx.get("is_news")):
             tool = "web_search"
             query = ""
@@ -1734,10 +2577,9 @@ async def run_bot(settings: Settings) -> None:
             max_n=news_max_items,
         )
 
-        force_web_search = _should_force_web_search(user_text)
         weather_override = False
-        if _is_weather_question(user_text) or force_web_search:
-            if _is_weather_question(user_text):
+        if is_weather_q or force_web_search:
+            if is_weather_q:
                 weather_override = True
             tool = "web_search"
 
@@ -1745,7 +2587,7 @@ async def run_bot(settings: Settings) -> None:
             dbg.write_json(
                 request_id=request_id,
                 name="plan",
-                data={"tool": tool, "query": query, "weather_override": weather_override},
+                data={"tool": tool, "query": query, "weather_override": weather_override, "planner_skipped": skip_planner},
             )
 
         search_results = []
@@ -1753,11 +2595,10 @@ async def run_bot(settings: Settings) -> None:
             if is_followup and prev_ctx.get("tool") == "web_search" and bool(prev_ctx.get("is_news")):
                 search_results = list(prev_ctx.get("search_results") or [])
             else:
-                is_weather = _is_weather_question(user_text)
-                loc = _extract_tw_location(user_text) if is_weather else ""
-                if is_weather and not loc:
+                loc = _extract_tw_location(user_text) if is_weather_q else ""
+                if is_weather_q and not loc:
                     loc = str(profile.get("default_weather_location") or "").strip()
-                if is_weather and not loc:
+                if is_weather_q and not loc:
                     assistant_text = "你想查哪個城市/地區的天氣？例如：台北 / 台中 / 高雄 / 蘇州 / 上海。"
                     if dbg.enabled:
                         dbg.write_json(
@@ -1766,37 +2607,36 @@ async def run_bot(settings: Settings) -> None:
                             data={"chat_id": chat_id, "assistant_text": assistant_text},
                         )
                     recent[chat_id].append({"role": "assistant", "content": assistant_text})
-                    await memory.add_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
+                    memory.queue_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
                     await update.message.reply_text(assistant_text, disable_web_page_preview=True)
                     return
 
-                if is_weather and loc and not query:
+                if is_weather_q and loc and not query:
                     nloc = _normalize_location(loc)
                     if _is_tw_location(nloc):
                         query = f"{nloc} 今天 天氣預報 降雨機率 最高溫 最低溫 體感 風速 中央氣象署"
                     else:
                         query = f"{nloc} 今天 天氣預報 降雨機率 最高溫 最低溫 體感 風速"
 
-                # Bias "today" news queries toward recency.
-                is_today = any(k in user_text for k in ["今天", "今日"])
-                if (not is_weather) and is_news_like and is_today and not query:
-                    query = f"{user_text} 過去 24 小時"
-
-                if not is_weather and not query and _is_market_index_query(user_text):
-                    if any(k in user_text.lower() for k in ["道瓊", "道琼", "dow jones", "djia"]):
-                        query = "Dow Jones Industrial Average latest close past 5 trading days"
+                if not is_weather_q and not query:
+                    query = _fallback_search_query(user_text, is_news_like=is_news_like)
 
                 q = query or user_text
                 if debug:
                     print(f"[debug] web_search query={q!r}")
-                try:
-                    search_results = await brave.web_search(
+                if speculative_search is not None and _same_search_query(q, speculative_query):
+                    search_call, speculative_search = speculative_search, None
+                else:
+                    search_call = brave.web_search(
                         query=q,
                         country=settings.brave_country,
                         lang=settings.brave_lang,
                         count=int(getattr(settings, "brave_count", 10) or 10),
+                        fresh=is_news_like or is_weather_q,
                         request_id=request_id,
                     )
+                try:
+                    search_results = await search_call
                 except Exception:
                     search_results = []
 
@@ -1813,6 +2653,9 @@ async def run_bot(settings: Settings) -> None:
                     data={"chat_id": chat_id, "reused_results": len(search_results)},
                 )
 
+        if speculative_search is not None:
+            _discard_task(speculative_search)
+
         search_block = _format_search_results(search_results) if search_results else ""
 
         fetched_pages: list[dict] = []
@@ -1820,22 +2663,18 @@ async def run_bot(settings: Settings) -> None:
             if is_followup and prev_ctx.get("tool") == "web_search" and bool(prev_ctx.get("is_news")):
                 fetched_pages = list(prev_ctx.get("fetched_pages") or [])
             else:
-                for item in search_results[:fetch_top_n]:
-                    url = (item.get("url") or "").strip()
-                    if not url:
-                        continue
-                    try:
-                        text = await _fetch_page_text(fetch_client, url=url, max_chars=fetch_max_chars)
-                    except Exception:
-                        text = ""
-                    fetched_pages.append({"title": item.get("title") or "", "url": url, "text": text})
+                fetched_pages = list(
+                    await asyncio.gather(
+                        *(_fetch_one(item, fetch) for item, fetch in _fetch_plan(search_results, fetch_top_n))
+                    )
+                )
 
         if debug and tool == "web_search":
             domains = [_domain((p.get("url") or "").strip()) for p in fetched_pages]
             sizes = [len((p.get("text") or "").strip()) for p in fetched_pages]
             print(f"[debug] results={len(search_results)} fetched={len(fetched_pages)} domains={domains} sizes={sizes}")
 
-        if tool == "web_search" and _is_weather_question(user_text):
+        if tool == "web_search" and is_weather_q:
             if not any((p.get("text") or "").strip() for p in fetched_pages):
                 await update.message.reply_text(
                     "我目前抓不到可用的即時天氣內容（可能被網站阻擋或來源不穩）。請再提供城市/地區，或改問：『台北今天降雨機率』。",
@@ -1843,68 +2682,103 @@ async def run_bot(settings: Settings) -> None:
                 )
                 return
 
-        fetched_block = _format_fetched_pages(fetched_pages)
+        is_news = "news" in msg_tags
 
         source_summaries: list[str] = []
         if tool == "web_search" and fetched_pages:
+            sources: list[tuple[int, str, str, str]] = []
             for i, p in enumerate(fetched_pages, start=1):
                 text = (p.get("text") or "").strip()
-                if not text:
+                if len(text) < _MIN_PAGE_CHARS:
                     continue
                 title = (p.get("title") or "").strip()
-                url = (p.get("url") or "").strip()
-                domain = _domain(url)
+                sources.append((i, title, _domain((p.get("url") or "").strip()), text))
+            # Skip the LLM call for pages sharing no term with the question; keep all if none match.
+            ngrams = _query_ngrams(user_text, query)
+            relevant = [src for src in sources if _looks_relevant(ngrams, src[1], src[3])]
+            if relevant:
+                if dbg.enabled and len(relevant) < len(sources):
+                    dbg.write_json(
+                        request_id=request_id,
+                        name="summarize_prefilter",
+                        data={"kept": [src[0] for src in relevant], "total": len(sources)},
+                    )
+                sources = relevant
+
+            # The summary prompt specializes on intent, not wording, so polls and follow-ups can share results.
+            intent = "news" if is_news else "weather" if is_weather_q else "generic"
+            summary_keys = {
+                i: _source_summary_key(intent, i, str(fetched_pages[i - 1].get("url") or ""), text)
+                for i, _, _, text in sources
+            }
+            summaries: dict[int, str] = {}
+            now = time.monotonic()
+            for i, key in summary_keys.items():
+                hit = source_summary_cache.get(key)
+                if hit is not None and hit[0] > now:
+                    source_summary_cache.move_to_end(key)
+                    summaries[i] = hit[1]
+            missing = [src for src in sources if src[0] not in summaries]
+
+            fresh: dict[int, str] = {}
+            if len(missing) > 1:
                 try:
-                    s = await _summarize_source(
+                    fresh = await _summarize_sources(
                         lm,
                         model=settings.lmstudio_chat_model,
                         user_text=user_text,
-                        source_index=i,
-                        title=title,
-                        domain=domain,
-                        content=text,
+                        sources=missing,
+                        request_id=request_id,
                     )
                 except Exception:
-                    s = ""
-                if s.strip():
-                    source_summaries.append(f"[{i}] {title} ({domain})\n{s.strip()}")
+                    fresh = {}
+            if missing and not fresh:
+                # Single source or an unusable batched reply: summarize each source on its own
+                # (LMStudioClient's semaphore bounds how many run at once).
+                results = await asyncio.gather(
+                    *(
+                        _summarize_source(
+                            lm,
+                            model=settings.lmstudio_chat_model,
+                            user_text=user_text,
+                            source_index=i,
+                            title=title,
+                            domain=domain,
+                            content=text,
+                        )
+                        for i, title, domain, text in missing
+                    ),
+                    return_exceptions=True,
+                )
+                fresh = {
+                    src[0]: r.strip() for src, r in zip(missing, results) if not isinstance(r, BaseException) and r.strip()
+                }
+            expires_at = time.monotonic() + (_NEWS_SUMMARY_CACHE_TTL_S if is_news else _SUMMARY_CACHE_TTL_S)
+            for i, summary in fresh.items():
+                source_summary_cache[summary_keys[i]] = (expires_at, summary)
+            while len(source_summary_cache) > _SOURCE_SUMMARY_CACHE_MAX:
+                source_summary_cache.popitem(last=False)
+            summaries.update(fresh)
+            for i, title, domain, _ in sources:
+                if i in summaries:
+                    source_summaries.append(f"[{i}] {title} ({domain})\n{summaries[i]}")
 
         summaries_block = "\n\n".join(source_summaries)
-        is_weather_q = _is_weather_question(user_text)
-
-        is_news = any(
-            k in user_text.lower()
-            for k in [
-                "新聞",
-                "新闻",
-                "news",
-                "headline",
-                "頭條",
-                "头条",
-                "兩岸",
-                "两岸",
-                "國際",
-                "国际",
-                "財經",
-                "财经",
-                "金融",
-                "finance",
-            ]
-        )
-        is_recent_news_q = _is_recent_news_query(user_text)
+        # Raw page text is only a fallback for missing summaries; skip building it otherwise.
+        fetched_block = "" if summaries_block else _format_fetched_pages(fetched_pages)
+
         source_date_hints, allowed_news_dates = _build_source_date_hints(search_results, fetched_pages)
 
         # Persist state into profile.json (topic/entities/time_range/last_tool/last_query/digest)
         entities: list[str] = []
-        tl = user_text.lower()
-        if any(k in tl for k in ["輝達", "英偉達", "nvidia"]):
+        if "nvidia" in msg_tags:
             entities.append("NVIDIA")
-        if any(k in tl for k in ["百度", "baidu", "bidu"]):
+        if "baidu" in msg_tags:
             entities.append("Baidu")
         time_range = ""
-        if any(k in user_text for k in ["今天", "今日"]):
+        if "today" in msg_tags:
             time_range = "today"
-        elif any(k in user_text for k in ["最近", "近日", "最新"]):
+        elif "recent_time" in msg_tags:
             time_range = "recent"
 
         state_updates: dict[str, object] = {}
@@ -1946,22 +2820,31 @@ async def run_bot(settings: Settings) -> None:
             maxlen = int(settings.recent_turns * 2)
         except Exception:
             maxlen = 12
-        if len(recent[chat_id]) >= maxlen:
+        history = recent[chat_id]
+        if len(history) >= maxlen:
             # Summarize older part, keep last few turns verbatim.
             keep_last = 6
-            turns_list = list(recent[chat_id])
-            older = turns_list[:-keep_last]
+            older = history.oldest(len(history) - keep_last)
             if older:
                 existing_summary = str(profile.get("conversation_summary") or "")
-                try:
-                    summary = await _summarize_conversation_for_profile(
-                        lm,
-                        model=settings.lmstudio_chat_model,
-                        existing_summary=existing_summary,
-                        turns=older,
-                    )
-                except Exception:
-                    summary = ""
+                summary_key = _conversation_digest(existing_summary, older)
+                summary = summary_cache.get(summary_key, "")
+                if summary:
+                    summary_cache.move_to_end(summary_key)
+                else:
+                    try:
+                        summary = await _summarize_conversation_for_profile(
+                            lm,
+                            model=settings.lmstudio_chat_model,
+                            existing_summary=existing_summary,
+                            turns=older,
+                        )
+                    except Exception:
+                        summary = ""
+                    if summary.strip():
+                        summary_cache[summary_key] = summary
+                        if len(summary_cache) > _SUMMARY_CACHE_MAX:
+                            summary_cache.popitem(last=False)
                 if summary.strip():
                     profile = await memory.upsert_profile(chat_id=chat_id, updates={"conversation_summary": summary.strip()})
                     if dbg.enabled:
@@ -1970,10 +2853,9 @@ async def run_bot(settings: Settings) -> None:
                             name="conversation_summary_updated",
                             data={"chat_id": chat_id, "chars": len(summary.strip())},
                         )
-                    recent[chat_id].clear()
-                    recent[chat_id].extend(turns_list[-keep_last:])
+                    history.drop_oldest(len(older))
 
-        system_parts: list[str] = ["You are a helpful Telegram chatbot."]
+        system_parts: list[str] = [_SYS_BOT_PROMPT]
         profile_prompt = _profile_to_system_prompt(profile)
         if profile_prompt:
             system_parts.append(profile_prompt)
@@ -2019,13 +2901,13 @@ async def run_bot(settings: Settings) -> None:
                             "content": (
                                 "The user is asking for news. "
                                 f"You MUST list at least {n} distinct news items if sources are available. "
-                                "Return a bullet list. Each bullet must contain: publication date (YYYY-MM-DD, or [未提供日期] if not available), a short headline, a 1-2 sentence summary, and a citation like [n]. "
-                                "The publication date must be placed at the beginning of each bullet. "
+                                "Reply with JSON only: a list of items, each with the publication date (YYYY-MM-DD, or [未提供日期] if not available), "
+                                "a short headline, a 1-2 sentence summary, and the citation source index n. "
                                 "Use only publication dates from the following source-date hints; do NOT invent dates:\n"
                                 + "\n".join(date_hint_lines)
                                 + "\n"
-                                "Each bullet MUST cite a different source index when possible. "
-                                "Do NOT write generic summaries. Do NOT merge multiple news into one bullet."
+                                "Each item MUST cite a different source index. "
+                                "Do NOT write generic summaries. Do NOT merge multiple news into one item."
                             ),
                         }
                     )
@@ -2077,7 +2959,7 @@ async def run_bot(settings: Settings) -> None:
                     }
                 )
 
-        history_for_prompt = list(recent[chat_id])
+        history_for_prompt = recent[chat_id].window(recent_tokens_budget)
         if tool == "web_search" and (is_weather_q or is_recent_news_q):
             # Avoid stale contamination from earlier assistant turns in recency-sensitive queries.
             user_only = [str(m.get("content") or "").strip() for m in history_for_prompt if m.get("role") == "user"]
@@ -2097,92 +2979,115 @@ async def run_bot(settings: Settings) -> None:
                 data={"messages": messages},
             )
 
-        assistant_text = await lm.chat_completions(
-            model=settings.lmstudio_chat_model,
-            messages=messages,
-            temperature=0.3,
-            max_tokens=900 if (tool == "web_search" and is_news) else None,
-            request_id=request_id,
-        )
-
-        if tool == "web_search" and is_news:
-            assistant_text = _sanitize_non_numeric_citations(assistant_text)
-
-        if tool == "web_search" and is_weather_q and search_results and _is_weather_refusal(assistant_text):
-            retry_messages = list(messages)
-            retry_messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Your previous answer is invalid because it refused real-time weather. "
-                        "You must answer using current provided sources and citations [n]. "
-                        "Do NOT refuse. Do NOT say you cannot provide real-time info. "
-                        "If exact numbers are unavailable, explicitly state 'sources do not contain the detailed forecast numbers'. "
-                        "Use Traditional Chinese with sections: 概況 / 溫度範圍 / 降雨機率 / 注意事項."
-                    ),
-                }
-            )
-            retry_messages.append(
-                {
-                    "role": "user",
-                    "content": user_text,
-                }
+        # Stream unless the answer may be rebuilt below: structured news, or weather / recent-news
+        # answers that can be regenerated by the refusal and stale-year checks.
+        structured_news = tool == "web_search" and is_news and bool(search_results)
+        revalidated = tool == "web_search" and bool(search_results) and (is_weather_q or is_recent_news_q)
+        streamed_msg: Message | None = None
+        streamed_text = ""
+        if not structured_news and not revalidated:
+            assistant_text, streamed_msg, streamed_text = await _stream_reply(
+                lm,
+                update.message,
+                model=settings.lmstudio_chat_model,
+                messages=messages,
+                temperature=0.3,
+                request_id=request_id,
             )
+        elif structured_news:
+            # One structured generation; dates, citations and layout are enforced locally when rendering.
+            news_items: list[dict[str, object]] | None = None
+            prose_ok = False
+            attempt_messages = messages
+            for attempt in range(2):
+                raw = await lm.chat_completions(
+                    model=settings.lmstudio_chat_model,
+                    messages=attempt_messages,
+                    temperature=0.3 if attempt == 0 else 0.1,
+                    max_tokens=900,
+                    response_format=_NEWS_ITEMS_RESPONSE_FORMAT,
+                    request_id=request_id,
+                )
+                news_items = _parse_news_items(
+                    raw,
+                    max_index=len(search_results),
+                    source_date_hints=source_date_hints,
+                    allowed_dates=allowed_news_dates,
+                )
+                if news_items is not None:
+                    break
+                # A model without structured-output support may still answer with valid bullets.
+                assistant_text = _sanitize_non_numeric_citations(raw)
+                violations = _news_prose_violations(
+                    assistant_text,
+                    allowed_dates=allowed_news_dates,
+                    max_index=len(search_results),
+                    recent=is_recent_news_q,
+                )
+                prose_ok = not violations
+                if prose_ok or attempt:
+                    break
+                # One retry that names every failed rule at once.
+                attempt_messages = [*messages, _news_retry_message(violations), {"role": "user", "content": user_text}]
+                if dbg.enabled:
+                    dbg.write_json(
+                        request_id=request_id,
+                        name="news_retry",
+                        data={"violations": violations},
+                    )
+
+            if news_items is not None and is_recent_news_q:
+                news_items = [it for it in news_items if not _contains_stale_year_for_recent(str(it["date"]))]
+                if not news_items:
+                    assistant_text = _build_recent_news_fallback(user_text=user_text, search_results=search_results)
+                    if dbg.enabled:
+                        dbg.write_json(
+                            request_id=request_id,
+                            name="recent_news_fallback_used",
+                            data={"reason": "stale_item_dates"},
+                        )
+            if news_items:
+                assistant_text = _render_news_items(news_items)
+            elif news_items is None and not prose_ok:
+                fallback_text = await _deterministic_news_fallback(
+                    lm,
+                    model=settings.lmstudio_chat_model,
+                    user_text=user_text,
+                    search_results=search_results,
+                    fetched_pages=fetched_pages,
+                    source_date_hints=source_date_hints,
+                    max_items=min(news_max_items, len(search_results)),
+                )
+                if fallback_text.strip():
+                    assistant_text = fallback_text.strip()
+                if dbg.enabled:
+                    dbg.write_json(
+                        request_id=request_id,
+                        name="news_deterministic_fallback_applied",
+                        data={"applied": bool(fallback_text.strip())},
+                    )
+        else:
             assistant_text = await lm.chat_completions(
                 model=settings.lmstudio_chat_model,
-                messages=retry_messages,
-                temperature=0.1,
-                max_tokens=450,
+                messages=messages,
+                temperature=0.3,
                 request_id=request_id,
             )
 
-        lang_pref = str(profile.get("preferred_language") or "").strip()
-        if lang_pref == "zh-Hant" and _looks_simplified_chinese(assistant_text):
-            rewrite_messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "Rewrite the text into Traditional Chinese (繁體中文) only. "
-                        "Keep meaning, structure, citations like [n], and URLs unchanged. "
-                        "Do not add or remove facts."
-                    ),
-                },
-                {"role": "user", "content": assistant_text},
-            ]
-            rewritten = await lm.chat_completions(
+        if tool == "web_search" and is_weather_q and search_results and _is_weather_refusal(assistant_text):
+            assistant_text = await lm.chat_completions(
                 model=settings.lmstudio_chat_model,
-                messages=rewrite_messages,
-                temperature=0.0,
-                max_tokens=1200,
+                messages=[*messages, _SYS_WEATHER_REFUSAL_RETRY, {"role": "user", "content": user_text}],
+                temperature=0.1,
+                max_tokens=450,
                 request_id=request_id,
             )
-            if (rewritten or "").strip():
-                assistant_text = rewritten.strip()
-            if dbg.enabled:
-                dbg.write_json(
-                    request_id=request_id,
-                    name="language_rewrite_applied",
-                    data={"preferred_language": lang_pref},
-                )
 
-        if tool == "web_search" and is_recent_news_q and search_results and _contains_stale_year_for_recent(assistant_text):
+        if not structured_news and tool == "web_search" and is_recent_news_q and search_results and _contains_stale_year_for_recent(assistant_text):
             stale_years = _extract_years(assistant_text)
-            retry_messages = list(messages)
-            retry_messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Your previous answer is invalid for a recent-news query because it used stale timeline years. "
-                        "Re-answer using only very recent updates from provided sources. "
-                        "If provided sources do not clearly support events in the last few days, explicitly say so and ask user whether to broaden the time range. "
-                        "Do NOT fabricate dates. Keep citations [n]."
-                    ),
-                }
-            )
-            retry_messages.append({"role": "user", "content": user_text})
             assistant_text = await lm.chat_completions(
                 model=settings.lmstudio_chat_model,
-                messages=retry_messages,
+                messages=[*messages, _SYS_STALE_NEWS_RETRY, {"role": "user", "content": user_text}],
                 temperature=0.1,
                 max_tokens=700,
                 request_id=request_id,
@@ -2194,7 +3099,7 @@ async def run_bot(settings: Settings) -> None:
                     data={"stale_years": stale_years},
                 )
 
-        if tool == "web_search" and is_recent_news_q and search_results and _contains_stale_year_for_recent(assistant_text):
+        if not structured_news and tool == "web_search" and is_recent_news_q and search_results and _contains_stale_year_for_recent(assistant_text):
             assistant_text = _build_recent_news_fallback(user_text=user_text, search_results=search_results)
             if dbg.enabled:
                 dbg.write_json(
@@ -2203,105 +3108,33 @@ async def run_bot(settings: Settings) -> None:
                     data={"reason": "stale_year_after_retry", "years": _extract_years(assistant_text)},
                 )
 
-        if tool == "web_search" and is_news and search_results and not _news_output_has_date_prefix(assistant_text):
-            retry_messages = list(messages)
-            retry_messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Your previous news output is invalid because each bullet must start with publication date. "
-                        "Rewrite as bullet list and put date at beginning of each bullet in YYYY-MM-DD. "
-                        "If source date is unavailable, start the bullet with [未提供日期]. "
-                        "Keep citations [n] and do not fabricate unsupported facts."
-                    ),
-                }
-            )
-            retry_messages.append({"role": "user", "content": user_text})
-            assistant_text = await lm.chat_completions(
-                model=settings.lmstudio_chat_model,
-                messages=retry_messages,
-                temperature=0.1,
-                max_tokens=900,
-                request_id=request_id,
-            )
-            if dbg.enabled:
-                dbg.write_json(
-                    request_id=request_id,
-                    name="news_date_retry",
-                    data={"enforced": True},
-                )
-
-        if tool == "web_search" and is_news and search_results and not _news_dates_grounded_in_sources(assistant_text, allowed_news_dates):
-            retry_messages = list(messages)
-            retry_messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Your previous dates are invalid because they are not grounded in source-date hints. "
-                        "Rewrite the news bullets and use only allowed dates from source-date hints or [未提供日期]. "
-                        "Do NOT fabricate dates. Keep citations [n]."
-                    ),
-                }
-            )
-            retry_messages.append({"role": "user", "content": user_text})
-            assistant_text = await lm.chat_completions(
-                model=settings.lmstudio_chat_model,
-                messages=retry_messages,
-                temperature=0.1,
-                max_tokens=900,
-                request_id=request_id,
-            )
-            if dbg.enabled:
-                dbg.write_json(
-                    request_id=request_id,
-                    name="news_date_grounding_retry",
-                    data={"allowed_dates": sorted(allowed_news_dates)},
-                )
-
-        if tool == "web_search" and is_news and search_results and not _news_has_diverse_citations(assistant_text, len(search_results)):
-            retry_messages = list(messages)
-            retry_messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Your previous answer overused a single citation index. "
-                        "Rewrite using multiple different citation indices [n] that match the corresponding sources. "
-                        "If multiple sources are available, do not cite only [1]."
-                    ),
-                }
-            )
-            retry_messages.append({"role": "user", "content": user_text})
-            assistant_text = await lm.chat_completions(
-                model=settings.lmstudio_chat_model,
-                messages=retry_messages,
-                temperature=0.1,
-                max_tokens=900,
-                request_id=request_id,
-            )
-            if dbg.enabled:
-                dbg.write_json(
+        # Every regeneration is above, so one pass covers drift to Simplified Chinese.
+        lang_pref = str(profile.get("preferred_language") or "").strip()
+        if lang_pref == "zh-Hant" and _looks_simplified_chinese(assistant_text):
+            stage = "opencc"
+            converted = _convert_s2t(assistant_text)
+            if converted:
+                assistant_text = converted
+            if not converted or _looks_simplified_chinese(assistant_text):
+                stage = "llm"
+                rewrite_messages = [
+                    _SYS_ZH_HANT_REWRITE,
+                    {"role": "user", "content": assistant_text},
+                ]
+                rewritten = await lm.chat_completions(
+                    model=settings.lmstudio_chat_model,
+                    messages=rewrite_messages,
+                    temperature=0.0,
+                    max_tokens=1200,
                     request_id=request_id,
-                    name="news_citation_diversity_retry",
-                    data={"enforced": True},
                 )
-
-        if tool == "web_search" and is_news and search_results and not _news_has_diverse_citations(assistant_text, len(search_results)):
-            fallback_text = await _deterministic_news_fallback(
-                lm,
-                model=settings.lmstudio_chat_model,
-                user_text=user_text,
-                search_results=search_results,
-                fetched_pages=fetched_pages,
-                source_date_hints=source_date_hints,
-                max_items=min(news_max_items, len(search_results)),
-            )
-            if fallback_text.strip():
-                assistant_text = fallback_text.strip()
+                if (rewritten or "").strip():
+                    assistant_text = rewritten.strip()
             if dbg.enabled:
                 dbg.write_json(
                     request_id=request_id,
-                    name="news_deterministic_fallback_applied",
-                    data={"applied": bool(fallback_text.strip())},
+                    name="language_rewrite_applied",
+                    data={"preferred_language": lang_pref, "stage": stage},
                 )
 
         # Persist last web_search context for follow-up.
@@ -2316,34 +3149,9 @@ async def run_bot(settings: Settings) -> None:
                 "source_date_hints": source_date_hints,
                 "ts": time.time(),
             }
-
-        if lang_pref == "zh-Hant" and _looks_simplified_chinese(assistant_text):
-            rewrite_messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "Rewrite the text into Traditional Chinese (繁體中文) only. "
-                        "Keep meaning, structure, citations like [n], and URLs unchanged. "
-                        "Do not add or remove facts."
-                    ),
-                },
-                {"role": "user", "content": assistant_text},
-            ]
-            rewritten = await lm.chat_completions(
-                model=settings.lmstudio_chat_model,
-                messages=rewrite_messages,
-                temperature=0.0,
-                max_tokens=1200,
-                request_id=request_id,
-            )
-            if (rewritten or "").strip():
-                assistant_text = rewritten.strip()
-            if dbg.enabled:
-                dbg.write_json(
-                    request_id=request_id,
-                    name="language_rewrite_applied",
-                    data={"preferred_language": lang_pref, "stage": "final"},
-                )
+            last_web_context.move_to_end(chat_id)
+            while len(last_web_context) > _WEB_CONTEXT_MAX_CHATS:
+                last_web_context.popitem(last=False)
 
         if tool == "web_search" and is_news and search_results:
             base_text = _strip_source_links_block(assistant_text)
@@ -2362,7 +3170,7 @@ async def run_bot(settings: Settings) -> None:
             if link_lines:
                 assistant_text = assistant_text.rstrip() + "\n\n" + "來源連結：\n" + "\n".join(link_lines)
 
-        if tool == "web_search" and _wants_links(user_text) and search_results and not is_news:
+        if tool == "web_search" and wants_links and search_results and not is_news:
             urls = [
                 (item.get("url") or "").strip()
                 for item in search_results
@@ -2372,7 +3180,7 @@ async def run_bot(settings: Settings) -> None:
                 assistant_text = assistant_text.rstrip() + "\n\n" + "\n".join(urls[:5])
 
         recent[chat_id].append({"role": "assistant", "content": assistant_text})
-        await memory.add_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
+        memory.queue_turn(chat_id=chat_id, role="assistant", content=assistant_text, ts=time.time())
 
         if dbg.enabled:
             dbg.write_json(
@@ -2381,9 +3189,29 @@ async def run_bot(settings: Settings) -> None:
                 data={"chat_id": chat_id, "assistant_text": assistant_text},
             )
 
-        await update.message.reply_text(assistant_text, disable_web_page_preview=True)
+        if streamed_msg is not None:
+            if assistant_text != streamed_text:
+                try:
+                    await streamed_msg.edit_text(assistant_text, disable_web_page_preview=True)
+                except Exception:
+                    await update.message.reply_text(assistant_text, disable_web_page_preview=True)
+        else:
+            await update.message.reply_text(assistant_text, disable_web_page_preview=True)
 
-    app = Application.builder().token(settings.telegram_bot_token).build()
+    # getUpdates long-polls hold a connection open, so keep them off the pool used for replies.
+    app = (
+        Application.builder()
+        .token(settings.telegram_bot_token)
+        .request(
+            HTTPXRequest(
+                connection_pool_size=int(getattr(settings, "telegram_pool_size", 32) or 32),
+                pool_timeout=float(getattr(settings, "telegram_pool_timeout", 10.0) or 10.0),
+            )
+        )
+        .get_updates_request(HTTPXRequest(connection_pool_size=4, pool_timeout=30.0))
+        .concurrent_updates(True)
+        .build()
+    )
     app.add_handler(CommandHandler("memory", on_memory_command))
     app.add_handler(CommandHandler("forget", on_forget_command))
     app.add_handler(CommandHandler("read_spec", on_read_spec_command))
@@ -2397,8 +3225,16 @@ async def run_bot(settings: Settings) -> None:
     try:
         await app.initialize()
         await app.start()
-        await app.updater.start_polling(drop_pending_updates=True)
-        await asyncio.Future()
+        await app.updater.start_polling(drop_pending_updates=True, timeout=30, poll_interval=0.0)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Not supported on Windows loops; Ctrl+C there still cancels asyncio.run().
+                pass
+        await stop.wait()
     finally:
         try:
             await app.updater.stop()
@@ -2407,5 +3243,8 @@ async def run_bot(settings: Settings) -> None:
         await brave.close()
         await fetch_client.aclose()
         await lm.close()
+        await api_client.aclose()
         await app.stop()
+        await memory.close()
+        dbg.flush()
         await app.shutdown()
@@ -1,15 +1,50 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import re
+import time
 import traceback
+import unicodedata
+from collections import OrderedDict
+from itertools import islice
 from typing import Any
 
 import httpx
 
-from .debug_logger import DebugLogger
+from . import jsonutil
+from .debug_logger import NULL_DEBUG_LOGGER, DebugLogger
 from .mcp_stdio_client import MCPServerConfig, MCPStdioClient
 
 
+_WEB_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
+# Per-call arguments that never change; merged after the query-specific keys.
+_MCP_ARGS_FIXED = {"safesearch": "moderate", "text_decorations": False}
+_REST_PARAMS_FIXED = {"safesearch": "moderate", "text_decorations": "false"}
+
+_CACHE_TTL_S = 600.0
+# News and weather go stale within minutes; evergreen lookups can be reused longer.
+_FRESH_CACHE_TTL_S = 120.0
+_CACHE_MAX_ENTRIES = 256
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+
+_RE_MCP_TEXT_FIELD = re.compile(r"(Title|Description|URL):(.*)")
+
+
+def _append_text_result(out: list[dict[str, Any]], title: str, url: str, description: str) -> None:
+    title, url = title.strip(), url.strip()
+    if title and url:
+        out.append({"title": title, "url": url, "description": description.strip()})
+
+
+def _web_results(body: Any) -> Any:
+    web = body.get("web") if isinstance(body, dict) else None
+    return (web.get("results") if isinstance(web, dict) else None) or ()
+
+
 class BraveSearchClient:
     def __init__(
         self,
@@ -20,46 +55,58 @@ class BraveSearchClient:
         mcp_enabled: bool = False,
         mcp_command: str = "npx",
         mcp_args: list[str] | None = None,
+        client: httpx.AsyncClient | None = None,
+        max_concurrency: int = 3,
     ):
         self._api_key = api_key
-        self._client = httpx.AsyncClient(timeout=timeout_s)
-        self._debug = debug_logger
+        # Built once; the client may be shared with LM Studio, so these stay per-request rather than client defaults.
+        self._headers = {
+            "Accept": "application/json",
+            "X-Subscription-Token": api_key,
+        }
+        self._sem = asyncio.Semaphore(max(1, int(max_concurrency)))
+        self._timeout_s = timeout_s
+        # A client passed in is shared with other services and closed by its owner.
+        self._owns_client = client is None
+        self._client = client if client is not None else httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0),
+            timeout=timeout_s,
+        )
+        # A disabled logger stands in when none is given, so call sites only check .enabled.
+        self._debug = debug_logger if debug_logger is not None else NULL_DEBUG_LOGGER
+        # (normalized query, country, lang, count) -> (stored_at, results); oldest first.
+        self._cache: OrderedDict[tuple[str, str, str, int], tuple[float, list[dict[str, Any]]]] = OrderedDict()
 
         self._mcp_enabled = mcp_enabled
         self._mcp: MCPStdioClient | None = None
-        self._mcp_config = MCPServerConfig(
-            command=mcp_command,
-            args=mcp_args or ["-y", "@modelcontextprotocol/server-brave-search"],
-            env={"BRAVE_API_KEY": api_key},
-        )
+        self._mcp_command = mcp_command
+        self._mcp_args = mcp_args or ["-y", "@modelcontextprotocol/server-brave-search"]
 
     async def close(self) -> None:
         if self._mcp is not None:
             await self._mcp.close()
             self._mcp = None
-        await self._client.aclose()
+        if self._owns_client:
+            await self._client.aclose()
 
     async def _ensure_mcp(self) -> MCPStdioClient:
         if self._mcp is None:
-            self._mcp = MCPStdioClient(self._mcp_config, timeout_s=30.0)
+            config = MCPServerConfig(command=self._mcp_command, args=self._mcp_args, env={"BRAVE_API_KEY": self._api_key})
+            self._mcp = MCPStdioClient(config, timeout_s=30.0)
             await self._mcp.start()
         return self._mcp
 
     def _parse_mcp_web_results(self, body: Any, *, count: int) -> list[dict[str, Any]]:
-        data = body if isinstance(body, dict) else {}
-        results_raw = (data.get("web", {}) or {}).get("results") or []
-        out: list[dict[str, Any]] = []
-        for item in list(results_raw)[:count]:
-            if not isinstance(item, dict):
-                continue
-            out.append(
-                {
-                    "title": item.get("title") or "",
-                    "url": item.get("url") or "",
-                    "description": item.get("description") or item.get("snippet") or "",
-                }
-            )
-        return out
+        return [
+            {
+                "title": item.get("title") or "",
+                "url": item.get("url") or "",
+                "description": item.get("description") or item.get("snippet") or "",
+            }
+            for item in islice(_web_results(body), count)
+            if isinstance(item, dict)
+        ]
 
     def _extract_mcp_body(self, res: dict[str, Any]) -> Any:
         # Common MCP tool shape: result.structuredContent carries machine-readable data.
@@ -73,23 +120,25 @@ class BraveSearchClient:
 
         content = res.get("content")
         if isinstance(content, list) and content:
-            # Prefer JSON payload blocks.
-            for item in content:
-                if isinstance(item, dict) and isinstance(item.get("json"), dict):
-                    return item.get("json")
-
-            # Fallback: attempt to parse text blocks as JSON.
+            # Prefer JSON payload blocks; remember the first text block that parses as JSON as the fallback.
+            fallback: dict[str, Any] | None = None
             for item in content:
-                if isinstance(item, dict) and item.get("type") == "text" and isinstance(item.get("text"), str):
-                    text = item["text"].strip()
-                    if not text:
+                if not isinstance(item, dict):
+                    continue
+                j = item.get("json")
+                if isinstance(j, dict):
+                    return j
+                if fallback is None and item.get("type") == "text":
+                    text = item.get("text")
+                    if not isinstance(text, str) or not text.strip():
                         continue
                     try:
-                        parsed = json.loads(text)
-                        if isinstance(parsed, dict):
-                            return parsed
+                        parsed = jsonutil.loads(text)
                     except Exception:
                         continue
+                    if isinstance(parsed, dict):
+                        fallback = parsed
+            return fallback
 
         return None
 
@@ -102,51 +151,61 @@ class BraveSearchClient:
         for item in content:
             if not isinstance(item, dict):
                 continue
-            if item.get("type") != "text" or not isinstance(item.get("text"), str):
+            text = item.get("text")
+            if item.get("type") != "text" or not isinstance(text, str):
                 continue
 
-            text = item.get("text", "")
-            current: dict[str, str] = {"title": "", "url": "", "description": ""}
-
-            def _flush_current() -> None:
-                if (current.get("title") or "").strip() and (current.get("url") or "").strip():
-                    out.append(
-                        {
-                            "title": current.get("title", "").strip(),
-                            "url": current.get("url", "").strip(),
-                            "description": current.get("description", "").strip(),
-                        }
-                    )
-
+            title, url, description = "", "", ""
             for raw_line in text.splitlines():
                 line = raw_line.strip()
                 if not line:
                     continue
 
-                if line.startswith("Title:"):
-                    _flush_current()
-                    current = {"title": line[len("Title:") :].strip(), "url": "", "description": ""}
-                    continue
-
-                if line.startswith("Description:"):
-                    current["description"] = line[len("Description:") :].strip()
+                m = _RE_MCP_TEXT_FIELD.match(line)
+                if m is None:
+                    # Continuation lines are appended to description.
+                    if description:
+                        description = (description + " " + line).strip()
                     continue
 
-                if line.startswith("URL:"):
-                    current["url"] = line[len("URL:") :].strip()
-                    continue
-
-                # Continuation lines are appended to description.
-                if current.get("description"):
-                    current["description"] = (current.get("description", "") + " " + line).strip()
+                key, value = m.group(1), m.group(2).strip()
+                if key == "Title":
+                    _append_text_result(out, title, url, description)
+                    title, url, description = value, "", ""
+                elif key == "Description":
+                    description = value
+                else:
+                    url = value
 
-            _flush_current()
+            _append_text_result(out, title, url, description)
 
             if len(out) >= count:
                 break
 
         return out[:count]
 
+    def _cache_get(self, key: tuple[str, str, str, int], *, max_age_s: float) -> list[dict[str, Any]] | None:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        stored_at, results = hit
+        # The age limit is the reader's: a fresh lookup must not reuse an entry an evergreen one would still accept.
+        age = time.monotonic() - stored_at
+        if age > max_age_s:
+            if age > _CACHE_TTL_S:
+                del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return [dict(r) for r in results]
+
+    def _cache_put(self, key: tuple[str, str, str, int], results: list[dict[str, Any]]) -> None:
+        if not results:
+            return
+        self._cache[key] = (time.monotonic(), [dict(r) for r in results])
+        self._cache.move_to_end(key)
+        while len(self._cache) > _CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
     async def web_search(
         self,
         *,
@@ -154,30 +213,59 @@ class BraveSearchClient:
         country: str = "TW",
         lang: str = "zh-hant",
         count: int = 5,
+        fresh: bool = False,
         request_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        cache_key = (_normalize_query(query), country, lang, int(count))
+        cached = self._cache_get(cache_key, max_age_s=_FRESH_CACHE_TTL_S if fresh else _CACHE_TTL_S)
+        if cached is not None:
+            if self._debug.enabled and request_id:
+                self._debug.write_json(
+                    request_id=request_id,
+                    name="brave_cache_hit",
+                    data={"query": query, "count": len(cached)},
+                )
+            return cached
+
+        async with self._sem:
+            results = await self._web_search_uncached(
+                query=query,
+                country=country,
+                lang=lang,
+                count=count,
+                request_id=request_id,
+            )
+        self._cache_put(cache_key, results)
+        return results
+
+    async def web_search_many(self, queries: list[str], **kwargs: Any) -> list[list[dict[str, Any]]]:
+        # In-flight requests are bounded by the per-client semaphore and multiplexed over the shared HTTP/2 client.
+        return list(await asyncio.gather(*(self.web_search(query=q, **kwargs) for q in queries)))
+
+    async def _web_search_uncached(
+        self,
+        *,
+        query: str,
+        country: str,
+        lang: str,
+        count: int,
+        request_id: str | None,
     ) -> list[dict[str, Any]]:
         if self._mcp_enabled:
             try:
                 mcp = await self._ensure_mcp()
-                args = {
-                    "query": query,
-                    "country": country,
-                    "search_lang": lang,
-                    "count": int(count),
-                    "safesearch": "moderate",
-                    "text_decorations": False,
-                }
-
-                if self._debug and self._debug.enabled and request_id:
+                args = {"query": query, "country": country, "search_lang": lang, "count": int(count), **_MCP_ARGS_FIXED}
+
+                if self._debug.enabled and request_id:
                     self._debug.write_json(
                         request_id=request_id,
                         name="brave_mcp_request",
-                        data={"tool": "brave_web_search", "arguments": args, "command": self._mcp_config.command, "args": self._mcp_config.args},
+                        data={"tool": "brave_web_search", "arguments": args, "command": self._mcp_command, "args": self._mcp_args},
                     )
 
                 res = await mcp.tools_call(name="brave_web_search", arguments=args)
 
-                if self._debug and self._debug.enabled and request_id:
+                if self._debug.enabled and request_id:
                     self._debug.write_json(
                         request_id=request_id,
                         name="brave_mcp_response",
@@ -191,7 +279,7 @@ class BraveSearchClient:
                     results = self._parse_mcp_text_results(res, count=count)
                 if not results:
                     raise RuntimeError("MCP returned no parseable web results")
-                if self._debug and self._debug.enabled and request_id:
+                if self._debug.enabled and request_id:
                     self._debug.write_json(
                         request_id=request_id,
                         name="brave_mcp_parsed_results",
@@ -199,33 +287,23 @@ class BraveSearchClient:
                     )
                 return results
             except Exception as e:
-                if self._debug and self._debug.enabled and request_id:
+                if self._debug.enabled and request_id:
                     self._debug.write_json(
                         request_id=request_id,
                         name="brave_mcp_error",
                         data={
                             "error": repr(e),
                             "traceback": traceback.format_exc(),
-                            "command": self._mcp_config.command,
-                            "args": self._mcp_config.args,
+                            "command": self._mcp_command,
+                            "args": self._mcp_args,
                         },
                     )
 
-        url = "https://api.search.brave.com/res/v1/web/search"
-        headers = {
-            "Accept": "application/json",
-            "X-Subscription-Token": self._api_key,
-        }
-        params = {
-            "q": query,
-            "country": country,
-            "search_lang": lang,
-            "count": str(count),
-            "safesearch": "moderate",
-            "text_decorations": "false",
-        }
+        url = _WEB_SEARCH_URL
+        headers = self._headers
+        params = {"q": query, "country": country, "search_lang": lang, "count": str(count), **_REST_PARAMS_FIXED}
 
-        if self._debug and self._debug.enabled and request_id:
+        if self._debug.enabled and request_id:
             self._debug.write_json(
                 request_id=request_id,
                 name="brave_request",
@@ -236,37 +314,41 @@ class BraveSearchClient:
             url,
             headers=headers,
             params=params,
+            timeout=self._timeout_s,
         )
 
-        if self._debug and self._debug.enabled and request_id:
-            try:
-                body = r.json()
-            except Exception:
-                body = {"_non_json_text": r.text}
+        # Decode once; the debug dump and the result parser share it.
+        parse_error: Exception | None = None
+        try:
+            data = jsonutil.loads(r.content)
+        except Exception as e:
+            data, parse_error = None, e
+
+        if self._debug.enabled and request_id:
             self._debug.write_json(
                 request_id=request_id,
                 name="brave_response",
                 data={
                     "status_code": r.status_code,
                     "headers": dict(r.headers),
-                    "body": body,
+                    "body": data if parse_error is None else {"_non_json_text": r.text},
                 },
             )
 
         r.raise_for_status()
-        data = r.json()
-
-        results: list[dict[str, Any]] = []
-        for item in (data.get("web", {}).get("results") or [])[:count]:
-            results.append(
-                {
-                    "title": item.get("title") or "",
-                    "url": item.get("url") or "",
-                    "description": item.get("description") or "",
-                }
-            )
-
-        if self._debug and self._debug.enabled and request_id:
+        if parse_error is not None:
+            raise parse_error
+
+        results = [
+            {
+                "title": item.get("title") or "",
+                "url": item.get("url") or "",
+                "description": item.get("description") or "",
+            }
+            for item in islice(_web_results(data), count)
+        ]
+
+        if self._debug.enabled and request_id:
             self._debug.write_json(
                 request_id=request_id,
                 name="brave_parsed_results",
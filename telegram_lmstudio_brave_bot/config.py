@@ -1,34 +1,44 @@
 from __future__ import annotations
 
-from pydantic import BaseModel
+from dataclasses import dataclass, field
+from functools import lru_cache
 
 
-class Settings(BaseModel):
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Settings:
     telegram_bot_token: str
     lmstudio_base_url: str = "http://localhost:1234/v1"
     lmstudio_chat_model: str = "qwen/qwen2.5-coder-14b"
     lmstudio_planner_model: str = "qwen/qwen2.5-coder-14b"
+    lmstudio_max_concurrency: int = 4
     brave_api_key: str
     brave_country: str = "TW"
     brave_lang: str = "zh-hant"
     brave_count: int = 10
+    brave_max_concurrency: int = 3
     debug: bool = False
     debug_dir: str = "debug"
     debug_max_str: int = 8000
     debug_max_list: int = 50
     mcp_brave_enabled: bool = False
     mcp_brave_command: str = "npx"
-    mcp_brave_args: list[str] = ["-y", "@modelcontextprotocol/server-brave-search"]
+    mcp_brave_args: list[str] = field(default_factory=lambda: ["-y", "@modelcontextprotocol/server-brave-search"])
     fetch_top_n: int = 10
     fetch_max_chars: int = 8000
+    fetch_concurrency: int = 8
     memory_dir: str = "memory"
     memory_mode: str = "per_chat_daily"
     memory_days: int = 1
+    memory_format: str = "markdown"
     recent_turns: int = 6
+    recent_tokens_budget: int = 4000
     news_followup_default_count: int = 5
     news_max_items: int = 8
+    telegram_pool_size: int = 32
+    telegram_pool_timeout: float = 10.0
 
 
+@lru_cache(maxsize=1)
 def load_settings() -> Settings:
     import os
 
@@ -53,10 +63,12 @@ def load_settings() -> Settings:
             os.environ.get("LMSTUDIO_PLANNER_MODEL", "").strip()
             or os.environ.get("LMSTUDIO_CHAT_MODEL", "qwen/qwen2.5-coder-14b").strip()
         ),
+        lmstudio_max_concurrency=int(os.environ.get("LMSTUDIO_MAX_CONCURRENCY", "4")),
         brave_api_key=brave_api_key,
         brave_country=os.environ.get("BRAVE_COUNTRY", "TW").strip(),
         brave_lang=os.environ.get("BRAVE_LANG", "zh-hant").strip(),
         brave_count=int(os.environ.get("BRAVE_COUNT", "10")),
+        brave_max_concurrency=int(os.environ.get("BRAVE_MAX_CONCURRENCY", "3")),
         debug=os.environ.get("DEBUG", "").strip() in {"1", "true", "True", "yes", "YES"},
         debug_dir=os.environ.get("DEBUG_DIR", "debug").strip() or "debug",
         debug_max_str=int(os.environ.get("DEBUG_MAX_STR", "8000")),
@@ -66,10 +78,15 @@ def load_settings() -> Settings:
         mcp_brave_args=mcp_brave_args,
         fetch_top_n=int(os.environ.get("FETCH_TOP_N", "10")),
         fetch_max_chars=int(os.environ.get("FETCH_MAX_CHARS", "8000")),
+        fetch_concurrency=int(os.environ.get("FETCH_CONCURRENCY", "8")),
         memory_dir=os.environ.get("MEMORY_DIR", "memory").strip(),
         memory_mode=os.environ.get("MEMORY_MODE", "per_chat_daily").strip(),
         memory_days=int(os.environ.get("MEMORY_DAYS", "1")),
+        memory_format=os.environ.get("MEMORY_FORMAT", "markdown").strip().lower() or "markdown",
         recent_turns=int(os.environ.get("RECENT_TURNS", "6")),
+        recent_tokens_budget=int(os.environ.get("RECENT_TOKENS_BUDGET", "4000")),
         news_followup_default_count=int(os.environ.get("NEWS_FOLLOWUP_DEFAULT_COUNT", "5")),
         news_max_items=int(os.environ.get("NEWS_MAX_ITEMS", "8")),
+        telegram_pool_size=int(os.environ.get("TELEGRAM_POOL_SIZE", "32")),
+        telegram_pool_timeout=float(os.environ.get("TELEGRAM_POOL_TIMEOUT", "10")),
     )
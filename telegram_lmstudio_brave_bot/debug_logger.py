@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-import json
 import os
+import queue
 import re
+import threading
 import time
-from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
+from . import jsonutil
+
 
 _REDACT_KEYS = {
     "authorization",
@@ -24,6 +30,13 @@ def _utc_datestr(ts: float | None = None) -> str:
     return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
 
 
+_RE_KIND_ID = re.compile(r"^(?:chat|spec|tech|gen)[_-]?(-?\d+)(?:_|-)")
+_RE_CHAT_EMBED = re.compile(r"chat[_-]?(-?\d+)(?:_|-)")
+_RE_LONG_DIGITS = re.compile(r"(-?\d{6,})")
+
+
+# One request emits many debug events under the same request_id.
+@lru_cache(maxsize=4096)
 def _chat_id_from_request_id(request_id: str) -> str:
     rid = (request_id or "").strip()
     if not rid:
@@ -34,24 +47,25 @@ def _chat_id_from_request_id(request_id: str) -> str:
     # - spec<chat_id>_<ts>
     # - tech<chat_id>_<ts>
     # - gen<chat_id>_<ts>
-    m = re.match(r"^(?:chat|spec|tech|gen)[_-]?(-?\d+)(?:_|-)", rid)
+    m = _RE_KIND_ID.match(rid)
     if m:
         return m.group(1)
 
     # Allow embedded 'chat<id>_' anywhere (defensive).
-    m2 = re.search(r"chat[_-]?(-?\d+)(?:_|-)", rid)
+    m2 = _RE_CHAT_EMBED.search(rid)
     if m2:
         return m2.group(1)
 
     # Last resort: extract a plausible chat id anywhere in the string.
     # Telegram chat ids are typically 6+ digits (users) or negative for groups.
-    m3 = re.search(r"(-?\d{6,})", rid)
+    m3 = _RE_LONG_DIGITS.search(rid)
     if m3:
         return m3.group(1)
 
     return "unknown"
 
 
+@lru_cache(maxsize=4096)
 def _kind_from_request_id(request_id: str) -> str:
     rid = (request_id or "").strip().lower()
     if rid.startswith("spec"):
@@ -65,6 +79,7 @@ def _kind_from_request_id(request_id: str) -> str:
     return "misc"
 
 
+@lru_cache(maxsize=256)
 def _bucket_for_event_name(name: str) -> str:
     n = (name or "").strip().lower()
     if n in {"telegram_in", "plan", "final_messages"}:
@@ -74,8 +89,11 @@ def _bucket_for_event_name(name: str) -> str:
     return "final"
 
 
+_RE_UNSAFE_FILENAME = re.compile(r"[^a-zA-Z0-9._-]+")
+
+
 def _safe_filename(s: str) -> str:
-    s = re.sub(r"[^a-zA-Z0-9._-]+", "_", s).strip("_")
+    s = _RE_UNSAFE_FILENAME.sub("_", s).strip("_")
     return s[:180] if len(s) > 180 else s
 
 
@@ -87,38 +105,64 @@ def _truncate_text(s: str, limit: int) -> str:
     return s[:limit] + f"\n...[truncated {len(s) - limit} chars]"
 
 
-def _sanitize(obj: Any, *, max_str: int, max_list: int, _depth: int = 0) -> Any:
-    if _depth > 12:
-        return "[max_depth]"
+_SCALAR_TYPES = frozenset({type(None), bool, int, float})
+
+
+# Built once per (max_str, max_list); the limits are closure variables so recursion passes only the node and depth.
+@lru_cache(maxsize=8)
+def _make_sanitizer(max_str: int, max_list: int) -> Callable[[Any], Any]:
+    def sanitize(obj: Any, depth: int = 0) -> Any:
+        if depth > 12:
+            return "[max_depth]"
+
+        # Exact-type fast paths for the common nodes; subclasses and rarer types take the isinstance chain below.
+        t = type(obj)
+        if t is str:
+            return obj if 0 < max_str and len(obj) <= max_str else _truncate_text(obj, max_str)
+        if t is dict:
+            return sanitize_dict(obj, depth)
+        if t is list or t is tuple:
+            return sanitize_list(obj, depth)
+        if t in _SCALAR_TYPES:
+            return obj
+
+        if obj is None or isinstance(obj, (bool, int, float)):
+            return obj
 
-    if obj is None or isinstance(obj, (bool, int, float)):
-        return obj
+        if isinstance(obj, str):
+            return _truncate_text(obj, max_str)
 
-    if isinstance(obj, str):
-        return _truncate_text(obj, max_str)
+        if isinstance(obj, bytes):
+            return f"[bytes:{len(obj)}]"
 
-    if isinstance(obj, bytes):
-        return f"[bytes:{len(obj)}]"
+        if isinstance(obj, dict):
+            return sanitize_dict(obj, depth)
 
-    if isinstance(obj, dict):
+        if isinstance(obj, (list, tuple)):
+            return sanitize_list(obj, depth)
+
+        return _truncate_text(repr(obj), max_str)
+
+    def sanitize_dict(obj: dict, depth: int) -> dict[str, Any]:
         out: dict[str, Any] = {}
         for k, v in obj.items():
             ks = str(k)
             if ks.strip().lower() in _REDACT_KEYS:
                 out[ks] = "[redacted]"
             else:
-                out[ks] = _sanitize(v, max_str=max_str, max_list=max_list, _depth=_depth + 1)
+                out[ks] = sanitize(v, depth + 1)
         return out
 
-    if isinstance(obj, (list, tuple)):
-        items = list(obj)
-        trimmed = items[:max_list]
-        out = [_sanitize(x, max_str=max_str, max_list=max_list, _depth=_depth + 1) for x in trimmed]
-        if len(items) > max_list:
-            out.append(f"...[truncated {len(items) - max_list} items]")
+    def sanitize_list(obj: list | tuple, depth: int) -> list[Any]:
+        out = [sanitize(x, depth + 1) for x in obj[:max_list]]
+        if len(obj) > max_list:
+            out.append(f"...[truncated {len(obj) - max_list} items]")
         return out
 
-    return _truncate_text(repr(obj), max_str)
+    return sanitize
+
+
+_QUEUE_MAX_EVENTS = 1024
 
 
 @dataclass
@@ -127,40 +171,97 @@ class DebugLogger:
     enabled: bool = False
     max_str: int = 8000
     max_list: int = 50
+    dropped: int = field(default=0, init=False)
+    _queue: queue.Queue | None = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
 
-    def _ensure_dir(self, *, request_id: str) -> Path:
+    def _dir_for(self, *, request_id: str) -> Path:
         chat_id = _chat_id_from_request_id(request_id)
         kind = _kind_from_request_id(request_id)
-        d = Path(self.base_dir) / f"{_utc_datestr()}_chat" / str(chat_id) / kind
-        d.mkdir(parents=True, exist_ok=True)
-        return d
+        return Path(self.base_dir) / f"{_utc_datestr()}_chat" / str(chat_id) / kind
 
     def write_json(self, *, request_id: str, name: str, data: Any) -> None:
         if not self.enabled:
             return
-        out_dir = self._ensure_dir(request_id=request_id)
-        bucket = _bucket_for_event_name(name)
-        fp = out_dir / f"{bucket}.json"
+        fp = self._dir_for(request_id=request_id) / f"{_bucket_for_event_name(name)}.jsonl"
+        # Sanitize on the caller's side so later mutations of `data` don't leak into the log.
         payload = {
             "ts": time.time(),
             "request_id": request_id,
             "name": name,
-            "data": _sanitize(data, max_str=self.max_str, max_list=self.max_list),
+            "data": _make_sanitizer(self.max_str, self.max_list)(data),
         }
-
-        items: list[dict[str, Any]] = []
-        if fp.exists():
+        try:
+            self._writer_queue().put_nowait((fp, payload))
+        except queue.Full:
+            # Never block the event loop on a slow disk; shed debug events instead.
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"[debug] writer queue full, dropped {self.dropped} events so far")
+
+    def flush(self) -> None:
+        if self._queue is not None:
+            self._queue.join()
+
+    def _writer_queue(self) -> queue.Queue:
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    q: queue.Queue = queue.Queue(maxsize=_QUEUE_MAX_EVENTS)
+                    threading.Thread(target=self._writer, args=(q,), name="debug-logger", daemon=True).start()
+                    self._queue = q
+        return self._queue
+
+    def _writer(self, q: queue.Queue) -> None:
+        # Append-mode descriptors stay open across batches; paths roll over daily, so only the newest few are kept.
+        fds: OrderedDict[Path, int] = OrderedDict()
+        while True:
+            batch = [q.get()]
+            while True:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
             try:
-                existing = json.loads(fp.read_text(encoding="utf-8"))
-                if isinstance(existing, list):
-                    items = existing
-                elif isinstance(existing, dict):
-                    items = [existing]
-            except Exception:
-                items = []
-
-        items.append(payload)
-        fp.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+                grouped: dict[Path, list[dict[str, Any]]] = {}
+                for fp, payload in batch:
+                    grouped.setdefault(fp, []).append(payload)
+                for fp, payloads in grouped.items():
+                    try:
+                        _append_items(fds, fp, payloads)
+                    except Exception:
+                        pass
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+
+_MAX_OPEN_FDS = 32
+
+
+def _append_items(fds: OrderedDict[Path, int], fp: Path, payloads: list[dict[str, Any]]) -> None:
+    # JSON Lines: one event per line, appended without reading back what is already there.
+    buf = b"".join(jsonutil.dumps(p) + b"\n" for p in payloads)
+    fd = fds.get(fp)
+    if fd is None:
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(fp, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        fds[fp] = fd
+        while len(fds) > _MAX_OPEN_FDS:
+            os.close(fds.popitem(last=False)[1])
+    else:
+        fds.move_to_end(fp)
+    try:
+        view = memoryview(buf)
+        while view:
+            view = view[os.write(fd, view):]
+    except OSError:
+        del fds[fp]
+        os.close(fd)
+        raise
+
+
+NULL_DEBUG_LOGGER = DebugLogger(enabled=False)
 
 
 def debug_logger_from_settings(settings: Any) -> DebugLogger:
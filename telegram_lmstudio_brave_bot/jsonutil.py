@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# orjson.JSONDecodeError subclasses this, so callers can catch it for either backend.
+JSONDecodeError = json.JSONDecodeError
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | bytearray | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,11 +1,149 @@
 from __future__ import annotations
 
-import json
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
 from typing import Any
 
 import httpx
 
-from .debug_logger import DebugLogger
+from . import jsonutil
+from .debug_logger import NULL_DEBUG_LOGGER, DebugLogger
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_SYS_NEED_SEARCH = {
+    "role": "system",
+    "content": "Decide if up-to-date web search is needed. Reply with JSON only.",
+}
+
+_SYS_BUILD_QUERY = {
+    "role": "system",
+    "content": "Rewrite the user message into a concise web search query. Reply with JSON only.",
+}
+
+_SYS_PLAN_TOOLS = {
+    "role": "system",
+    "content": (
+        "You can optionally call a tool. Your goal is accuracy. "
+        "Decide whether web search is necessary for the user's message. "
+        "Use tool=web_search when ANY of the following is true: "
+        "(1) the question is time-sensitive (today/latest/current/2024/2025/2026/news/prices/releases), "
+        "(2) the answer needs verification, factual precision, or citations, "
+        "(3) the user asks for sources/links, "
+        "(4) the question is ambiguous and search can disambiguate, "
+        "(5) you are not highly confident. "
+        "Only use tool=none for general knowledge, math, coding that doesn't require up-to-date info, or when the user explicitly forbids browsing. "
+        "If using web_search, craft a concise query with key entities, constraints, and locale if relevant. "
+        "Reply with JSON only."
+    ),
+}
+
+_NEED_SEARCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "need_search",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "need_search": {"type": "boolean"},
+                "query": {"type": "string"},
+            },
+            "required": ["need_search", "query"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_SEARCH_QUERY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "search_query",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+            },
+            "required": ["query"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_TOOL_PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "tool_plan",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "tool": {"type": "string", "enum": ["web_search", "none"]},
+                "query": {"type": "string"},
+            },
+            "required": ["tool", "query"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class _EmbeddingBatcher:
+    def __init__(
+        self,
+        send: Callable[[list[str], str | None], Awaitable[list[list[float]]]],
+        *,
+        window_s: float = 0.01,
+        max_items: int = 64,
+    ):
+        self._send = send
+        self._window_s = window_s
+        self._max_items = max_items
+        self._pending: list[tuple[list[str], str | None, asyncio.Future[list[list[float]]]]] = []
+        self._pending_items = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, texts: list[str], *, request_id: str | None = None) -> list[list[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[list[list[float]]] = loop.create_future()
+        self._pending.append((list(texts), request_id, fut))
+        self._pending_items += len(texts)
+        if self._pending_items >= self._max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_items = self._pending, [], 0
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[list[str], str | None, asyncio.Future[list[list[float]]]]]) -> None:
+        texts = [t for item_texts, _, _ in batch for t in item_texts]
+        request_id = next((rid for _, rid, _ in batch if rid), None)
+        try:
+            vectors = await self._send(texts, request_id)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        i = 0
+        for item_texts, _, fut in batch:
+            if not fut.done():
+                fut.set_result(vectors[i : i + len(item_texts)])
+            i += len(item_texts)
 
 
 class LMStudioClient:
@@ -15,13 +153,22 @@ class LMStudioClient:
         timeout_s: float = 60.0,
         *,
         debug_logger: DebugLogger | None = None,
+        client: httpx.AsyncClient | None = None,
+        max_concurrency: int = 4,
     ):
         self._base_url = base_url.rstrip("/")
-        self._client = httpx.AsyncClient(timeout=timeout_s)
-        self._debug = debug_logger
+        # Queue excess calls here instead of piling them onto the connection pool.
+        self._sem = asyncio.Semaphore(max(1, int(max_concurrency)))
+        self._timeout_s = timeout_s
+        # A client passed in is shared with other services and closed by its owner.
+        self._owns_client = client is None
+        self._client = client if client is not None else httpx.AsyncClient(timeout=timeout_s)
+        self._debug = debug_logger if debug_logger is not None else NULL_DEBUG_LOGGER
+        self._embedding_batchers: dict[str, _EmbeddingBatcher] = {}
 
     async def close(self) -> None:
-        await self._client.aclose()
+        if self._owns_client:
+            await self._client.aclose()
 
     async def chat_completions(
         self,
@@ -44,21 +191,24 @@ class LMStudioClient:
             payload["response_format"] = response_format
 
         url = f"{self._base_url}/chat/completions"
-        if self._debug and self._debug.enabled and request_id:
+        if self._debug.enabled and request_id:
             self._debug.write_json(
                 request_id=request_id,
                 name="lmstudio_chat_request",
                 data={"url": url, "payload": payload},
             )
 
-        resp = await self._client.post(
-            url,
-            json=payload,
-        )
+        async with self._sem:
+            resp = await self._client.post(
+                url,
+                content=jsonutil.dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=self._timeout_s,
+            )
 
-        if self._debug and self._debug.enabled and request_id:
+        if self._debug.enabled and request_id:
             try:
-                body = resp.json()
+                body = jsonutil.loads(resp.content)
             except Exception:
                 body = {"_non_json_text": resp.text}
             self._debug.write_json(
@@ -68,34 +218,111 @@ class LMStudioClient:
             )
 
         resp.raise_for_status()
-        data = resp.json()
+        data = jsonutil.loads(resp.content)
         return data["choices"][0]["message"]["content"]
 
+    async def stream_chat_completions(
+        self,
+        *,
+        model: str,
+        messages: list[dict[str, Any]],
+        temperature: float = 0.2,
+        max_tokens: int | None = None,
+        request_id: str | None = None,
+    ) -> AsyncIterator[str]:
+        payload: dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+
+        url = f"{self._base_url}/chat/completions"
+        if self._debug.enabled and request_id:
+            self._debug.write_json(
+                request_id=request_id,
+                name="lmstudio_chat_stream_request",
+                data={"url": url, "payload": payload},
+            )
+
+        parts: list[str] = []
+        async with self._sem, self._client.stream(
+            "POST",
+            url,
+            content=jsonutil.dumps(payload),
+            headers=_JSON_HEADERS,
+            timeout=self._timeout_s,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                # SSE frames: "data: {json}" per chunk, terminated by "data: [DONE]".
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = jsonutil.loads(data)
+                except jsonutil.JSONDecodeError:
+                    continue
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        if self._debug.enabled and request_id:
+            self._debug.write_json(
+                request_id=request_id,
+                name="lmstudio_chat_stream_response",
+                data={"status_code": resp.status_code, "content": "".join(parts)},
+            )
+
     async def embeddings(
         self,
         *,
         model: str,
         input_texts: list[str],
         request_id: str | None = None,
+    ) -> list[list[float]]:
+        # Concurrent callers for the same model share one /embeddings request.
+        batcher = self._embedding_batchers.get(model)
+        if batcher is None:
+            batcher = _EmbeddingBatcher(partial(self._embeddings_request, model))
+            self._embedding_batchers[model] = batcher
+        return await batcher.submit(input_texts, request_id=request_id)
+
+    async def _embeddings_request(
+        self,
+        model: str,
+        input_texts: list[str],
+        request_id: str | None,
     ) -> list[list[float]]:
         url = f"{self._base_url}/embeddings"
         payload = {"model": model, "input": input_texts}
 
-        if self._debug and self._debug.enabled and request_id:
+        if self._debug.enabled and request_id:
             self._debug.write_json(
                 request_id=request_id,
                 name="lmstudio_embeddings_request",
                 data={"url": url, "payload": payload},
             )
 
-        resp = await self._client.post(
-            url,
-            json=payload,
-        )
+        async with self._sem:
+            resp = await self._client.post(
+                url,
+                content=jsonutil.dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=self._timeout_s,
+            )
 
-        if self._debug and self._debug.enabled and request_id:
+        if self._debug.enabled and request_id:
             try:
-                body = resp.json()
+                body = jsonutil.loads(resp.content)
             except Exception:
                 body = {"_non_json_text": resp.text}
             self._debug.write_json(
@@ -105,7 +332,7 @@ class LMStudioClient:
             )
 
         resp.raise_for_status()
-        data = resp.json()
+        data = jsonutil.loads(resp.content)
         return [item["embedding"] for item in data["data"]]
 
 
@@ -115,32 +342,19 @@ async def llm_need_search(
     model: str,
     user_text: str,
 ) -> dict[str, Any]:
-    schema = {
-        "type": "object",
-        "properties": {
-            "need_search": {"type": "boolean"},
-            "query": {"type": "string"},
-        },
-        "required": ["need_search", "query"],
-        "additionalProperties": False,
-    }
-
     content = await client.chat_completions(
         model=model,
         messages=[
-            {
-                "role": "system",
-                "content": "Decide if up-to-date web search is needed. Reply with JSON only.",
-            },
+            _SYS_NEED_SEARCH,
             {"role": "user", "content": user_text},
         ],
         temperature=0.0,
-        response_format={"type": "json_schema", "json_schema": {"name": "need_search", "schema": schema}},
+        response_format=_NEED_SEARCH_RESPONSE_FORMAT,
     )
 
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
+        return jsonutil.loads(content)
+    except jsonutil.JSONDecodeError:
         return {"need_search": False, "query": ""}
 
 
@@ -150,33 +364,21 @@ async def llm_build_search_query(
     model: str,
     user_text: str,
 ) -> dict[str, Any]:
-    schema = {
-        "type": "object",
-        "properties": {
-            "query": {"type": "string"},
-        },
-        "required": ["query"],
-        "additionalProperties": False,
-    }
-
     content = await client.chat_completions(
         model=model,
         messages=[
-            {
-                "role": "system",
-                "content": "Rewrite the user message into a concise web search query. Reply with JSON only.",
-            },
+            _SYS_BUILD_QUERY,
             {"role": "user", "content": user_text},
         ],
         temperature=0.0,
-        response_format={"type": "json_schema", "json_schema": {"name": "search_query", "schema": schema}},
+        response_format=_SEARCH_QUERY_RESPONSE_FORMAT,
     )
 
     try:
-        data = json.loads(content)
+        data = jsonutil.loads(content)
         q = (data.get("query") or "").strip()
         return {"query": q}
-    except json.JSONDecodeError:
+    except jsonutil.JSONDecodeError:
         return {"query": ""}
 
 
@@ -186,47 +388,22 @@ async def llm_plan_tools(
     model: str,
     user_text: str,
 ) -> dict[str, Any]:
-    schema = {
-        "type": "object",
-        "properties": {
-            "tool": {"type": "string", "enum": ["web_search", "none"]},
-            "query": {"type": "string"},
-        },
-        "required": ["tool", "query"],
-        "additionalProperties": False,
-    }
-
     content = await client.chat_completions(
         model=model,
         messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You can optionally call a tool. Your goal is accuracy. "
-                    "Decide whether web search is necessary for the user's message. "
-                    "Use tool=web_search when ANY of the following is true: "
-                    "(1) the question is time-sensitive (today/latest/current/2024/2025/2026/news/prices/releases), "
-                    "(2) the answer needs verification, factual precision, or citations, "
-                    "(3) the user asks for sources/links, "
-                    "(4) the question is ambiguous and search can disambiguate, "
-                    "(5) you are not highly confident. "
-                    "Only use tool=none for general knowledge, math, coding that doesn't require up-to-date info, or when the user explicitly forbids browsing. "
-                    "If using web_search, craft a concise query with key entities, constraints, and locale if relevant. "
-                    "Reply with JSON only."
-                ),
-            },
+            _SYS_PLAN_TOOLS,
             {"role": "user", "content": user_text},
         ],
         temperature=0.0,
-        response_format={"type": "json_schema", "json_schema": {"name": "tool_plan", "schema": schema}},
+        response_format=_TOOL_PLAN_RESPONSE_FORMAT,
     )
 
     try:
-        data = json.loads(content)
+        data = jsonutil.loads(content)
         tool = (data.get("tool") or "none").strip()
         query = (data.get("query") or "").strip()
         if tool not in {"web_search", "none"}:
             tool = "none"
         return {"tool": tool, "query": query}
-    except json.JSONDecodeError:
+    except jsonutil.JSONDecodeError:
         return {"tool": "none", "query": ""}
@@ -1,12 +1,25 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import itertools
 import os
 import shutil
 from dataclasses import dataclass
 from typing import Any
 
+from . import jsonutil
+
+
+_READ_CHUNK_BYTES = 1 << 16
+_STREAM_LIMIT_BYTES = 1 << 20
+_SEND_HIGH_WATER_BYTES = 1 << 16
+_MAX_PENDING = 1024
+
+
+def _expire(fut: asyncio.Future[Any]) -> None:
+    if not fut.done():
+        fut.set_exception(asyncio.TimeoutError())
+
 
 @dataclass
 class MCPServerConfig:
@@ -23,8 +36,7 @@ class MCPStdioClient:
         self._reader_task: asyncio.Task[None] | None = None
         self._stderr_task: asyncio.Task[None] | None = None
         self._pending: dict[int, asyncio.Future[dict[str, Any]]] = {}
-        self._next_id = 1
-        self._lock = asyncio.Lock()
+        self._ids = itertools.count(1)
 
     async def start(self) -> None:
         if self._proc is not None:
@@ -55,6 +67,7 @@ class MCPStdioClient:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 env=child_env,
+                limit=_STREAM_LIMIT_BYTES,
             )
         except FileNotFoundError:
             if os.name != "nt":
@@ -68,6 +81,7 @@ class MCPStdioClient:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 env=child_env,
+                limit=_STREAM_LIMIT_BYTES,
             )
         assert self._proc.stdout is not None
         self._reader_task = asyncio.create_task(self._reader_loop(self._proc.stdout))
@@ -107,22 +121,34 @@ class MCPStdioClient:
         if self._stderr_task is not None:
             self._stderr_task.cancel()
 
+        # Fail outstanding requests now rather than leaving callers to wait out their timeouts.
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("MCP client closed"))
+        self._pending.clear()
+
         self._proc = None
 
     async def request(self, method: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
         await self.start()
-        async with self._lock:
-            req_id = self._next_id
-            self._next_id += 1
+        if len(self._pending) >= _MAX_PENDING:
+            raise RuntimeError(f"MCP client has {len(self._pending)} requests in flight")
+        req_id = next(self._ids)
 
-        fut: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[dict[str, Any]] = loop.create_future()
         self._pending[req_id] = fut
 
-        await self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params or {}})
-
+        timer: asyncio.TimerHandle | None = None
+        # Everything after registration sits in the try, so a failed send cannot leak its _pending entry.
         try:
-            return await asyncio.wait_for(fut, timeout=self._timeout_s)
+            await self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params or {}})
+            # A timer on the future itself instead of wait_for, which wraps every call in extra futures and callbacks.
+            timer = loop.call_later(self._timeout_s, _expire, fut)
+            return await fut
         finally:
+            if timer is not None:
+                timer.cancel()
             self._pending.pop(req_id, None)
 
     async def notify(self, method: str, params: dict[str, Any] | None = None) -> None:
@@ -155,31 +181,46 @@ class MCPStdioClient:
         if proc is None or proc.stdin is None:
             raise RuntimeError("MCP process not started")
 
-        data = json.dumps(msg, ensure_ascii=False)
-        if "\n" in data:
+        data = jsonutil.dumps(msg)
+        if b"\n" in data:
             raise RuntimeError("MCP message contains newline; stdio transport requires newline-delimited JSON")
 
-        proc.stdin.write((data + "\n").encode("utf-8"))
-        await proc.stdin.drain()
+        stdin = proc.stdin
+        stdin.write(data + b"\n")
+        # The transport buffers and flushes writes itself; only wait for the pipe once a backlog builds up.
+        if stdin.is_closing() or stdin.transport.get_write_buffer_size() > _SEND_HIGH_WATER_BYTES:
+            await stdin.drain()
 
     async def _reader_loop(self, stdout: asyncio.StreamReader) -> None:
+        # Bulk reads split in user space: one await per chunk rather than per message, and no line-length limit.
+        buf = bytearray()
         while True:
-            line_b = await stdout.readline()
-            if not line_b:
+            chunk = await stdout.read(_READ_CHUNK_BYTES)
+            if not chunk:
+                if buf:
+                    self._dispatch_line(buf)
                 return
-            line = line_b.decode("utf-8", errors="replace").strip()
-            if not line:
-                continue
-            try:
-                msg = json.loads(line)
-            except Exception:
-                continue
+            buf += chunk
+            start = 0
+            while (nl := buf.find(b"\n", start)) >= 0:
+                self._dispatch_line(buf[start:nl])
+                start = nl + 1
+            del buf[:start]
+
+    def _dispatch_line(self, line_b: bytes | bytearray) -> None:
+        # Raw bytes go straight to the decoder; blank or malformed lines just fail to parse.
+        try:
+            msg = jsonutil.loads(line_b)
+        except Exception:
+            return
+        if not isinstance(msg, dict):
+            return
 
-            msg_id = msg.get("id")
-            if isinstance(msg_id, int) and msg_id in self._pending:
-                fut = self._pending.get(msg_id)
-                if fut is not None and not fut.done():
-                    fut.set_result(msg)
+        msg_id = msg.get("id")
+        if isinstance(msg_id, int) and msg_id in self._pending:
+            fut = self._pending.get(msg_id)
+            if fut is not None and not fut.done():
+                fut.set_result(msg)
 
     async def _drain_stderr(self, stderr: asyncio.StreamReader) -> None:
         while True:
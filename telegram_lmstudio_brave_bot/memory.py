@@ -1,11 +1,86 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as _dt
 import json
 import os
 import re
+import threading
+from collections.abc import Callable
+from functools import lru_cache, partial
 from typing import Any
 
+from . import jsonutil
+
+
+# The chat id is part of the pattern, so one scan over the whole file yields only this chat's turns.
+@lru_cache(maxsize=1024)
+def _turn_pattern(chat_id: int) -> re.Pattern[str]:
+    return re.compile(rf"^- \[[0-9:]{{8}}\] chat:{chat_id} \((user|assistant)\) (.*)$", re.MULTILINE)
+
+
+_TAIL_BYTES_PER_TURN = 512
+
+
+def _read_tail_turns(path: str, parse: Callable[[str], list[dict[str, Any]]], need: int) -> list[dict[str, Any]]:
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        window = need * _TAIL_BYTES_PER_TURN
+        while True:
+            start = max(0, size - window)
+            # Start one byte early so a window that begins exactly on a line keeps that line.
+            f.seek(start - 1 if start else 0)
+            data = f.read()
+            if start:
+                nl = data.find(b"\n")
+                data = data[nl + 1 :] if nl >= 0 else b""
+            text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            turns = parse(text)
+            if len(turns) >= need or not start:
+                break
+            window *= 4
+    return turns[-need:]
+
+
+def _parse_markdown_turns(text: str, pattern: re.Pattern[str]) -> list[dict[str, Any]]:
+    return [{"role": m.group(1), "content": m.group(2).replace("\\n", "\n")} for m in pattern.finditer(text)]
+
+
+def _parse_jsonl_turns(text: str, chat_id: int) -> list[dict[str, Any]]:
+    turns: list[dict[str, Any]] = []
+    # Split on "\n" only: JSON escapes it inside strings, but not other separators splitlines() would honour.
+    for line in text.split("\n"):
+        if not line:
+            continue
+        try:
+            obj = jsonutil.loads(line)
+        except Exception:
+            continue
+        if not isinstance(obj, dict) or obj.get("chat") != chat_id:
+            continue
+        role = obj.get("role")
+        if role in ("user", "assistant"):
+            turns.append({"role": role, "content": str(obj.get("content") or "")})
+    return turns
+
+
+_RE_MARKDOWN_TURN = re.compile(r"^- \[([0-9:]{8})\] chat:(-?\d+) \((user|assistant)\) (.*)$", re.MULTILINE)
+
+
+def _migrate_markdown_log(md_path: str, jsonl_path: str) -> None:
+    # Old hand-edited logs may hold stray bytes; keep the readable turns rather than failing the whole file.
+    with open(md_path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    lines = [
+        jsonutil.dumps({"t": m.group(1), "chat": int(m.group(2)), "role": m.group(3), "content": m.group(4).replace("\\n", "\n")})
+        + b"\n"
+        for m in _RE_MARKDOWN_TURN.finditer(text)
+    ]
+    tmp = jsonl_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"".join(lines))
+    os.replace(tmp, jsonl_path)
+
 
 class MarkdownMemory:
     def __init__(
@@ -14,23 +89,34 @@ class MarkdownMemory:
         memory_dir: str = "memory",
         mode: str = "daily",
         days: int = 1,
+        fmt: str = "markdown",
     ):
         self._dir = memory_dir
         self._mode = mode
         self._days = max(1, int(days))
+        self._jsonl = fmt == "jsonl"
+        self._ext = ".jsonl" if self._jsonl else ".md"
+        # jsonl paths already checked for a markdown log to convert.
+        self._migrated: set[str] = set()
+        self._migrate_lock = threading.Lock()
+        self._turn_q: asyncio.Queue[tuple[int, str, str, float]] | None = None
+        self._turn_writer: asyncio.Task | None = None
+        self._known_dirs: set[str] = set()
+        # profile path -> (st_mtime_ns, st_size, parsed profile); dropped whenever this instance rewrites the file.
+        self._profile_cache: dict[str, tuple[int, int, dict[str, Any]]] = {}
 
     def _path_for(self, *, day: _dt.date, chat_id: int) -> str:
         d = day.isoformat()
 
         if self._mode == "daily":
-            return os.path.join(self._dir, f"chat_{chat_id}", f"{d}.md")
+            return os.path.join(self._dir, f"chat_{chat_id}", f"{d}{self._ext}")
         if self._mode == "per_chat_daily":
-            return os.path.join(self._dir, f"chat_{chat_id}", f"{d}.md")
+            return os.path.join(self._dir, f"chat_{chat_id}", f"{d}{self._ext}")
         if self._mode == "per_chat":
-            return os.path.join(self._dir, f"chat_{chat_id}.md")
+            return os.path.join(self._dir, f"chat_{chat_id}{self._ext}")
 
         # fallback
-        return os.path.join(self._dir, f"{d}.md")
+        return os.path.join(self._dir, f"{d}{self._ext}")
 
     def _paths_to_read(self, *, chat_id: int) -> list[str]:
         today = _dt.date.today()
@@ -49,50 +135,130 @@ class MarkdownMemory:
         return os.path.join(self._dir, f"chat_{chat_id}", "profile.json")
 
     async def add_turn(self, *, chat_id: int, role: str, content: str, ts: float) -> None:
-        day = _dt.date.fromtimestamp(ts)
-        path = self._path_for(day=day, chat_id=chat_id)
-        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        await self.add_turns([(chat_id, role, content, ts)])
+
+    async def add_turns(self, turns: list[tuple[int, str, str, float]]) -> None:
+        # Group by target file so a batch costs one open/append per file.
+        by_path: dict[str, list[str]] = {}
+        for chat_id, role, content, ts in turns:
+            day = _dt.date.fromtimestamp(ts)
+            path = self._path_for(day=day, chat_id=chat_id)
+
+            t = _dt.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+            if self._jsonl:
+                line = jsonutil.dumps({"t": t, "chat": chat_id, "role": role, "content": content}).decode("utf-8")
+            else:
+                safe = content.replace("\n", "\\n")
+                line = f"- [{t}] chat:{chat_id} ({role}) {safe}"
+            by_path.setdefault(path, []).append(line + "\n")
+
+        await asyncio.to_thread(self._append_lines, by_path)
+
+    def _append_lines(self, by_path: dict[str, list[str]]) -> None:
+        for path, lines in by_path.items():
+            d = os.path.dirname(path) or "."
+            if d not in self._known_dirs:
+                os.makedirs(d, exist_ok=True)
+                self._known_dirs.add(d)
+            self._migrate_if_needed(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+    def queue_turn(self, *, chat_id: int, role: str, content: str, ts: float) -> None:
+        # Off the reply path: callers enqueue, one background writer appends in batches.
+        if self._turn_q is None:
+            self._turn_q = asyncio.Queue()
+            self._turn_writer = asyncio.create_task(self._write_turns(self._turn_q))
+        self._turn_q.put_nowait((chat_id, role, content, ts))
+
+    async def _write_turns(self, q: asyncio.Queue[tuple[int, str, str, float]]) -> None:
+        while True:
+            batch = [await q.get()]
+            await asyncio.sleep(0.05)
+            while len(batch) < 256 and not q.empty():
+                batch.append(q.get_nowait())
+            try:
+                await self.add_turns(batch)
+            except Exception as e:
+                print(f"[memory] failed to persist {len(batch)} turns: {e!r}")
+            finally:
+                for _ in batch:
+                    q.task_done()
 
-        t = _dt.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
-        safe = content.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "\\n")
+    async def flush(self) -> None:
+        if self._turn_q is not None:
+            await self._turn_q.join()
 
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(f"- [{t}] chat:{chat_id} ({role}) {safe}\n")
+    async def close(self) -> None:
+        await self.flush()
+        if self._turn_writer is not None:
+            self._turn_writer.cancel()
+        self._turn_q = None
+        self._turn_writer = None
 
     async def recent_turns(self, *, chat_id: int, limit: int) -> list[dict[str, Any]]:
-        pattern = re.compile(r"^- \[[0-9:]{8}\] chat:(-?\d+) \((user|assistant)\) (.*)$")
+        await self.flush()
+        if limit <= 0:
+            return []
+        return await asyncio.to_thread(self._recent_turns_sync, chat_id, limit)
+
+    def _recent_turns_sync(self, chat_id: int, limit: int) -> list[dict[str, Any]]:
+        if self._jsonl:
+            parse = partial(_parse_jsonl_turns, chat_id=int(chat_id))
+        else:
+            parse = partial(_parse_markdown_turns, pattern=_turn_pattern(int(chat_id)))
         turns: list[dict[str, Any]] = []
 
-        for path in self._paths_to_read(chat_id=chat_id):
-            if not os.path.exists(path):
+        # Newest file first, reading only as much of each file's tail as the remaining limit needs.
+        for path in reversed(self._paths_to_read(chat_id=chat_id)):
+            try:
+                self._migrate_if_needed(path)
+            except Exception:
                 continue
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    m = pattern.match(line.rstrip("\n"))
-                    if not m:
-                        continue
-                    if int(m.group(1)) != int(chat_id):
-                        continue
-                    role = m.group(2)
-                    content = m.group(3).replace("\\n", "\n")
-                    turns.append({"role": role, "content": content})
+            # Let open() report missing days instead of a separate exists() stat per path.
+            try:
+                turns[:0] = _read_tail_turns(path, parse, limit - len(turns))
+            except FileNotFoundError:
+                continue
+            if len(turns) >= limit:
+                break
 
-        if limit <= 0:
-            return []
         return turns[-limit:]
 
+    def _migrate_if_needed(self, path: str) -> None:
+        # One-shot conversion of a markdown log written before MEMORY_FORMAT=jsonl was switched on.
+        # Callers run in worker threads; the lock keeps appends out of a file until its conversion has finished.
+        if not self._jsonl or path in self._migrated:
+            return
+        with self._migrate_lock:
+            if path in self._migrated:
+                return
+            md_path = path[: -len(self._ext)] + ".md"
+            if not os.path.exists(path) and os.path.exists(md_path):
+                try:
+                    _migrate_markdown_log(md_path, path)
+                except Exception as e:
+                    # Left unmarked so the next read or append retries instead of orphaning the markdown log.
+                    print(f"[memory] failed to convert {md_path} to jsonl: {e!r}")
+                    raise
+            self._migrated.add(path)
+
     async def get_profile(self, *, chat_id: int) -> dict[str, Any]:
-        path = self._profile_path(chat_id=chat_id)
-        if not os.path.exists(path):
-            return {}
+        return await asyncio.to_thread(self._read_profile_cached, self._profile_path(chat_id=chat_id))
+
+    def _read_profile_cached(self, path: str) -> dict[str, Any]:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, dict):
-                return data
-            return {}
-        except Exception:
+            st = os.stat(path)
+        except OSError:
+            self._profile_cache.pop(path, None)
             return {}
+        hit = self._profile_cache.get(path)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return dict(hit[2])
+        data = _read_profile(path)
+        self._profile_cache[path] = (st.st_mtime_ns, st.st_size, data)
+        return dict(data)
 
     async def upsert_profile(self, *, chat_id: int, updates: dict[str, Any]) -> dict[str, Any]:
         base = await self.get_profile(chat_id=chat_id)
@@ -106,18 +272,50 @@ class MarkdownMemory:
             merged[k] = v
 
         path = self._profile_path(chat_id=chat_id)
-        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(merged, f, ensure_ascii=False, indent=2)
-
+        self._profile_cache.pop(path, None)
+        await asyncio.to_thread(_write_profile, path, merged)
         return merged
 
     async def clear_profile(self, *, chat_id: int) -> bool:
         path = self._profile_path(chat_id=chat_id)
-        if not os.path.exists(path):
-            return False
-        try:
-            os.remove(path)
-            return True
-        except Exception:
-            return False
+        self._profile_cache.pop(path, None)
+        return await asyncio.to_thread(_remove_profile, path)
+
+
+# Profile file helpers run in a worker thread so disk latency never stalls the event loop.
+def _read_profile(path: str) -> dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            data = jsonutil.loads(f.read())
+        if isinstance(data, dict):
+            return data
+        return {}
+    except Exception:
+        return {}
+
+
+def _write_profile(path: str, data: dict[str, Any]) -> None:
+    new = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == new:
+                return
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write a sibling file and swap it in, so a crash never leaves a half-written profile.
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(new)
+    os.replace(tmp, path)
+
+
+def _remove_profile(path: str) -> bool:
+    if not os.path.exists(path):
+        return False
+    try:
+        os.remove(path)
+        return True
+    except Exception:
+        return False